@@ -1,33 +1,126 @@
 import numpy
 import pandas as pd
+import scipy.sparse
+from blocked_similarity import BlockedSimilarity
+from config_parser import ParseConfig
 
 from phase1_task_1 import ActorTag
 
+conf = ParseConfig()
+
 
 class ActorActorMatrix(ActorTag):
-    def fetchActorActorSimilarityMatrix(self):
-        actor_info = self.data_extractor.get_imdb_actor_info_data()
-        actor_ids = actor_info.id
-        actor_ids = actor_ids.sort_values()
-        list_of_tag_vectors = []
-        for actorid in actor_ids:
-            tag_vector = self.merge_movie_actor_and_tag(actorid, 'TFIDF')
-            list_of_tag_vectors.append(tag_vector)
-        actor_tag_matrix = pd.DataFrame(list_of_tag_vectors).values
-        where_are_NaNs = numpy.isnan(actor_tag_matrix)
-        actor_tag_matrix[where_are_NaNs] = 0
+    # Settings used when neither the constructor nor the similarity section of config.ini sets them
+    DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+    DEFAULT_TOP_K = 50
+
+    def __init__(self, memory_budget=None, processes=None, top_k=None):
+        """
+        :param memory_budget: bytes of dense similarity tile held at a time, memory_budget of the similarity
+        section of config.ini when not passed
+        :param processes: number of worker processes of the similarity computation, processes of the similarity
+        section when not passed, the tiles are computed in this process when neither is set
+        :param top_k: number of most similar actors kept for every actor in the actor neighbour matrix, top_k of
+        the similarity section when not passed
+        """
+        super().__init__()
+        settings = conf.config_section_mapper("similarity") if conf.config.has_section("similarity") else {}
+        if memory_budget is None:
+            memory_budget = int(settings.get("memory_budget") or self.DEFAULT_MEMORY_BUDGET)
+        if processes is None and settings.get("processes"):
+            processes = int(settings.get("processes"))
+        self.top_k = top_k if top_k is not None else int(settings.get("top_k") or self.DEFAULT_TOP_K)
+        self.similarity = BlockedSimilarity(memory_budget, processes)
+
+    def get_actor_tag_vectors(self, actor_ids):
+        """
+        Rows of the TFIDF actor tag matrix for the given actors, actors without tags get a row of zeros
+        :param actor_ids:
+        :return: sparse actor x tag matrix
+        """
+        (actor_tag_matrix, tagged_actor_ids, tags) = self.get_actor_tag_matrix('TFIDF')
+        positions = pd.Index(tagged_actor_ids).get_indexer(actor_ids)
+        rows = numpy.flatnonzero(positions >= 0)
+        selector = scipy.sparse.csr_matrix((numpy.ones(len(rows)), (rows, positions[rows])),
+                                           shape=(len(positions), len(tagged_actor_ids)))
+
+        return selector.dot(actor_tag_matrix)
+
+    def build_actor_tag_vectors(self):
+        """
+        TFIDF tag vectors of all the actors, in the order of their sorted ids
+        :return: (sparse actor x tag matrix, sorted actor ids, tags)
+        """
+        actor_ids = self.data_extractor.get_imdb_actor_info_data().id.sort_values().values
+        tags = self.get_actor_tag_matrix('TFIDF')[2]
+
+        return self.get_actor_tag_vectors(actor_ids), actor_ids, tags
+
+    def get_stored_actor_tag_matrix(self):
+        """
+        Actor tag matrix from the matrix store, built again only when one of its resource files changes
+        :return: (sparse actor x tag matrix, sorted actor ids, tags)
+        """
+        return self.data_extractor.get_stored_matrix("actor_tag_matrix", self.build_actor_tag_vectors,
+                                                     self.ACTOR_TAG_DATA_FILES)
 
-        tag_actor_matrix = actor_tag_matrix.transpose()
+    def build_actor_actor_matrix(self):
+        """
+        Actor actor similarity matrix, the product of the actor tag matrix with its transpose.
+        It is computed in tiles of actors written straight into the memory mapped file of the matrix store,
+        so the dense matrix never has to fit in memory.
+        :return: (dense actor x actor matrix, sorted actor ids, sorted actor ids)
+        """
+        (actor_tag_matrix, actor_ids, tags) = self.get_stored_actor_tag_matrix()
+        output = None
+        if self.data_extractor.matrix_store is not None:
+            output = self.data_extractor.matrix_store.create_dense_matrix("actor_actor_matrix",
+                                                                          (len(actor_ids), len(actor_ids)))
+        actor_actor_matrix = self.similarity.compute(actor_tag_matrix, output)
 
-        actor_actor_matrix = numpy.dot(actor_tag_matrix, tag_actor_matrix)
+        return actor_actor_matrix, actor_ids, actor_ids
+
+    def build_actor_neighbour_matrix(self, top_k):
+        """
+        Sparse actor actor similarity matrix with only the top_k most similar other actors of every actor
+        :param top_k:
+        :return: (sparse actor x actor matrix, sorted actor ids, sorted actor ids)
+        """
+        (actor_tag_matrix, actor_ids, tags) = self.get_stored_actor_tag_matrix()
+
+        return self.similarity.compute_top_k(actor_tag_matrix, top_k), actor_ids, actor_ids
+
+    def fetchActorNeighbourMatrix(self):
+        """
+        Top k neighbours of every actor from the matrix store, holding top_k similarities per actor instead of
+        the dense actor actor matrix
+        :return: sparse actor x actor matrix, sorted actor ids
+        """
+        (neighbour_matrix, actor_ids, column_ids) = self.data_extractor.get_stored_matrix(
+            "actor_neighbour_matrix", lambda: self.build_actor_neighbour_matrix(self.top_k),
+            self.ACTOR_TAG_DATA_FILES, {"top_k": self.top_k})
+
+        return neighbour_matrix, pd.Series(actor_ids, name="id")
+
+    def get_actor_neighbour_row(self, actorid):
+        """
+        Similarities of one actor to its top k neighbours, read from the matrix store without loading the whole
+        neighbour matrix
+        :param actorid:
+        :return: array of similarities in the order of the sorted actor ids, zero outside the neighbours,
+        None for an unknown actor
+        """
+        return self.data_extractor.get_stored_row("actor_neighbour_matrix", actorid,
+                                                  lambda: self.build_actor_neighbour_matrix(self.top_k),
+                                                  self.ACTOR_TAG_DATA_FILES, {"top_k": self.top_k})
+
+    def fetchActorActorSimilarityMatrix(self):
+        (actor_actor_matrix, actor_ids, column_ids) = self.data_extractor.get_stored_matrix(
+            "actor_actor_matrix", self.build_actor_actor_matrix, self.ACTOR_TAG_DATA_FILES)
 
-        #matrix.to_csv('actor_tag_matrix.csv', index=False, encoding='utf-8')
-        numpy.savetxt("actor_tag_matrix.csv", actor_tag_matrix, delimiter=",")
-        numpy.savetxt("tag_actor_matrix.csv", tag_actor_matrix, delimiter=",")
-        numpy.savetxt("actor_actor_matrix.csv", actor_actor_matrix, delimiter=",")
-        return actor_actor_matrix, actor_ids
+        return actor_actor_matrix, pd.Series(actor_ids, name="id")
 
 
 if __name__ == "__main__":
     obj = ActorActorMatrix()
-    matrix = obj.fetchActorActorSimilarityMatrix()
\ No newline at end of file
+    matrix = obj.fetchActorActorSimilarityMatrix()
@@ -0,0 +1,109 @@
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import numpy
+from topic_model import TopicModel
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+logging.getLogger("gensim").setLevel(logging.WARNING)
+
+
+class TopicModelBenchmark(object):
+    """
+    Time the LDA backends on a synthetic tag corpus: the single process model on an in-memory and on a
+    serialized corpus, the multicore model for a range of worker counts, and an online update folding the last
+    documents into a fitted model against training again on all of them
+    """
+
+    def __init__(self, num_docs, num_tags, tags_per_doc, num_topics, passes, seed=0):
+        self.num_topics = num_topics
+        self.passes = passes
+        self.documents = self.build_documents(num_docs, num_tags, tags_per_doc, num_topics, seed)
+
+    def build_documents(self, num_docs, num_tags, tags_per_doc, num_topics, seed):
+        """
+        Tag documents of movies drawn from a mixture of topics, every topic favouring its own block of tags
+        :param num_docs:
+        :param num_tags:
+        :param tags_per_doc: average number of tags of a document
+        :param num_topics:
+        :param seed:
+        :return: list of lists of tags
+        """
+        random = numpy.random.RandomState(seed)
+        tags = numpy.array(["tag_%d" % each for each in range(num_tags)], dtype=object)
+        topic_tags = random.dirichlet(numpy.full(num_tags, 0.05), num_topics)
+        documents = []
+        for mixture in random.dirichlet(numpy.full(num_topics, 0.2), num_docs):
+            tag_distribution = mixture @ topic_tags
+            documents.append(list(tags[random.choice(num_tags, random.poisson(tags_per_doc) + 1,
+                                                     p=tag_distribution / tag_distribution.sum())]))
+
+        return documents
+
+    def time_fit(self, label, topic_model, documents):
+        start = time.perf_counter()
+        # the synthetic documents are fully determined by their number, which keys their serialized corpus
+        topic_model.fit(documents, self.num_topics, "documents", str(len(documents)))
+        seconds = time.perf_counter() - start
+        log.info("%s: %.2f s", label, seconds)
+
+        return seconds
+
+    def run(self, workers_list, update_fraction):
+        """
+        Time every backend once on the whole corpus, then an online update of the last documents
+        :param workers_list: worker counts of the multicore backend
+        :param update_fraction: fraction of the documents folded in by the online update
+        :return: list of (option, seconds)
+        """
+        corpus_path = tempfile.mkdtemp()
+        results = []
+        try:
+            results.append(("single, in-memory corpus", self.time_fit(
+                "single, in-memory corpus", TopicModel("single", passes=self.passes), self.documents)))
+            for label in ["single, corpus serialized", "single, serialized corpus reused"]:
+                results.append((label, self.time_fit(
+                    label, TopicModel("single", passes=self.passes, corpus_path=corpus_path), self.documents)))
+            for workers in workers_list:
+                label = "multicore, %d workers, serialized corpus" % workers
+                results.append((label, self.time_fit(
+                    label, TopicModel("multicore", workers, passes=self.passes, corpus_path=corpus_path),
+                    self.documents)))
+
+            split = int(len(self.documents) * (1 - update_fraction))
+            topic_model = TopicModel("single", passes=self.passes, corpus_path=corpus_path)
+            self.time_fit("single, first %d documents" % split, topic_model, self.documents[:split])
+            start = time.perf_counter()
+            topic_model.update(self.documents[split:])
+            seconds = time.perf_counter() - start
+            log.info("Online update with the last %d documents: %.2f s", len(self.documents) - split, seconds)
+            results.append(("online update", seconds))
+        finally:
+            shutil.rmtree(corpus_path)
+
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='benchmark_topic_model.py --docs 20000 --tags 5000',
+    )
+    parser.add_argument('--docs', action="store", type=int, default=20000)
+    parser.add_argument('--tags', action="store", type=int, default=5000)
+    parser.add_argument('--tags_per_doc', action="store", type=int, default=30)
+    parser.add_argument('--topics', action="store", type=int, default=10)
+    parser.add_argument('--passes', action="store", type=int, default=20)
+    parser.add_argument('--workers', action="store", type=str, default=",".join(
+        str(each) for each in sorted({1, max(1, (os.cpu_count() or 2) - 1)})))
+    parser.add_argument('--update_fraction', action="store", type=float, default=0.05)
+    parser.add_argument('--seed', action="store", type=int, default=0)
+    input = vars(parser.parse_args())
+    benchmark = TopicModelBenchmark(input['docs'], input['tags'], input['tags_per_doc'], input['topics'],
+                                    input['passes'], input['seed'])
+    benchmark.run([int(each) for each in input['workers'].split(",")], input['update_fraction'])
@@ -0,0 +1,99 @@
+import argparse
+import logging
+import time
+
+import numpy
+import scipy.linalg
+import scipy.sparse
+from truncated_svd import TruncatedSVD
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+
+class TruncatedSVDBenchmark(object):
+    """
+    Compare the rank k decompositions of the truncated SVD engine against the full SVD
+    on a synthetic sparse matrix with a decaying spectrum
+    """
+
+    def __init__(self, num_rows, num_columns, density, seed=0):
+        self.truncated_svd = TruncatedSVD()
+        self.matrix = self.build_matrix(num_rows, num_columns, density, seed)
+
+    def build_matrix(self, num_rows, num_columns, density, seed, num_clusters=20):
+        """
+        Sparse non negative matrix whose rows fall in clusters drawing most of their columns from the block of
+        their cluster, the way movies of a genre share their tags. The clusters have geometrically decreasing
+        sizes, which gives a decaying spectrum.
+        :param num_rows:
+        :param num_columns:
+        :param density:
+        :param seed:
+        :param num_clusters:
+        :return: csr matrix
+        """
+        random = numpy.random.RandomState(seed)
+        num_entries = int(num_rows * num_columns * density)
+        rows = random.randint(0, num_rows, num_entries)
+        row_clusters = numpy.minimum(random.geometric(0.2, num_rows) - 1, num_clusters - 1)
+        block = num_columns // num_clusters
+        clustered = random.rand(num_entries) < 0.7
+        columns = numpy.where(clustered, row_clusters[rows] * block + random.randint(0, block, num_entries),
+                              random.randint(0, num_columns, num_entries))
+        matrix = scipy.sparse.csr_matrix((random.rand(num_entries), (rows, columns)), shape=(num_rows, num_columns))
+        matrix.sum_duplicates()
+
+        return matrix
+
+    def get_errors(self, exact, approximate):
+        """
+        Accuracy of a rank k decomposition
+        :param exact: (U, s, Vh) of the full decomposition cut to rank k
+        :param approximate: (U, s, Vh) of the rank k decomposition
+        :return: (largest relative error of the singular values, sine of the largest angle between the
+        subspaces of the left singular vectors)
+        """
+        value_error = numpy.max(numpy.abs(approximate[1] - exact[1]) / exact[1])
+        cosines = scipy.linalg.svdvals(exact[0].T @ approximate[0])
+        angle_error = numpy.sqrt(max(0.0, 1 - cosines.min() ** 2))
+
+        return value_error, angle_error
+
+    def run(self, ranks):
+        """
+        Time the full decomposition once and the rank k decomposition for every rank
+        :param ranks:
+        :return: list of (rank, seconds, singular value error, subspace error)
+        """
+        start = time.perf_counter()
+        (U, s, Vh) = scipy.linalg.svd(self.matrix.toarray(), full_matrices=False)
+        full_time = time.perf_counter() - start
+        log.info("Full SVD of %d x %d: %.2f s", self.matrix.shape[0], self.matrix.shape[1], full_time)
+
+        results = []
+        for k in ranks:
+            exact = (U[:, :k], s[:k], Vh[:k])
+            start = time.perf_counter()
+            approximate = self.truncated_svd.decompose(self.matrix, k)
+            seconds = time.perf_counter() - start
+            (value_error, angle_error) = self.get_errors(exact, approximate)
+            log.info("k=%d: %.2f s (%.1fx), singular value error %.1e, subspace error %.1e", k, seconds,
+                     full_time / seconds, value_error, angle_error)
+            results.append((k, seconds, value_error, angle_error))
+
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='benchmark_truncated_svd.py --rows 20000 --columns 2000',
+    )
+    parser.add_argument('--rows', action="store", type=int, default=20000)
+    parser.add_argument('--columns', action="store", type=int, default=2000)
+    parser.add_argument('--density', action="store", type=float, default=0.01)
+    parser.add_argument('--ranks', action="store", type=str, default="5,10,20")
+    parser.add_argument('--seed', action="store", type=int, default=0)
+    input = vars(parser.parse_args())
+    benchmark = TruncatedSVDBenchmark(input['rows'], input['columns'], input['density'], input['seed'])
+    benchmark.run([int(each) for each in input['ranks'].split(",")])
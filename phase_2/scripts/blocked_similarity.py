@@ -0,0 +1,168 @@
+import logging
+import multiprocessing
+
+import numpy
+import scipy.sparse
+
+log = logging.getLogger(__name__)
+
+worker_state = {}
+
+
+def init_worker(matrix, output_loc, top_k):
+    """
+    Keep the matrix and the output of the computation in every worker of the process pool
+    :param matrix: sparse entity x feature matrix
+    :param output_loc: location of the memory mapped output, None when the tiles are sent back
+    :param top_k: number of neighbours to keep for every row, None to keep them all
+    """
+    worker_state["similarity"] = BlockedSimilarity()
+    worker_state["matrix"] = matrix
+    worker_state["transpose"] = matrix.transpose().tocsr()
+    worker_state["output"] = numpy.load(output_loc, mmap_mode="r+") if output_loc is not None else None
+    worker_state["top_k"] = top_k
+
+
+def compute_tile_in_worker(bounds):
+    """
+    Compute one tile in a worker of the process pool
+    :param bounds: (first row, last row + 1) of the tile
+    :return: (bounds, tile) where the tile is None when it was written to the memory mapped output
+    """
+    (start, end) = bounds
+    similarity = worker_state["similarity"]
+    tile = similarity.compute_tile(worker_state["matrix"], worker_state["transpose"], start, end)
+    if worker_state["top_k"] is not None:
+        return bounds, similarity.get_top_k_tile(tile, start, worker_state["top_k"])
+    if worker_state["output"] is not None:
+        worker_state["output"][start:end] = tile
+        worker_state["output"].flush()
+        return bounds, None
+
+    return bounds, tile
+
+
+class BlockedSimilarity(object):
+    """
+    Class to compute the similarity matrix (the product of a sparse entity x feature matrix with its transpose)
+    one tile of rows at a time, so that only a tile of the dense result is held in memory.
+    The tiles are either written into an output array, which can be a memory mapped file,
+    or reduced to the top k neighbours of every row. Tiles can be computed in a pool of processes.
+    """
+
+    def __init__(self, memory_budget=256 * 1024 * 1024, processes=None):
+        """
+        :param memory_budget: bytes of dense tile the computation may hold at a time, per process
+        :param processes: number of worker processes, the tiles are computed in this process when not passed
+        """
+        self.memory_budget = memory_budget
+        self.processes = processes
+
+    def get_tile_rows(self, num_rows, num_columns):
+        """
+        Number of rows of a tile, so that a dense tile and the sparse product it comes from fit in the memory budget
+        :param num_rows:
+        :param num_columns:
+        :return: rows per tile
+        """
+        row_bytes = 2 * max(num_columns, 1) * numpy.dtype(numpy.float64).itemsize
+
+        return int(min(max(self.memory_budget // row_bytes, 1), max(num_rows, 1)))
+
+    def get_tile_bounds(self, num_rows, num_columns):
+        tile_rows = self.get_tile_rows(num_rows, num_columns)
+
+        return [(start, min(start + tile_rows, num_rows)) for start in range(0, num_rows, tile_rows)]
+
+    def compute_tile(self, matrix, transpose, start, end):
+        """
+        Similarities of the rows start to end - 1 to all the rows
+        :param matrix: sparse entity x feature matrix in csr form
+        :param transpose: its transpose in csr form
+        :param start:
+        :param end:
+        :return: dense tile
+        """
+        return matrix[start:end].dot(transpose).toarray()
+
+    def get_top_k_tile(self, tile, start, top_k):
+        """
+        Keep the top_k largest positive similarities of every row of a tile, leaving out the row itself
+        :param tile: dense tile
+        :param start: index of the first row of the tile
+        :param top_k:
+        :return: (rows, columns, similarities) of the kept entries
+        """
+        rows = numpy.arange(tile.shape[0])
+        tile[rows, rows + start] = 0
+        top_k = min(top_k, tile.shape[1])
+        if top_k == 0:
+            return numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64), numpy.empty(0)
+        columns = numpy.argpartition(-tile, top_k - 1, axis=1)[:, :top_k]
+        values = numpy.take_along_axis(tile, columns, axis=1)
+        keep = values > 0
+        tile_rows = numpy.repeat(rows, top_k).reshape(columns.shape)
+
+        return tile_rows[keep] + start, columns[keep], values[keep]
+
+    def iterate_tiles(self, matrix, output_loc, top_k):
+        """
+        Compute all the tiles, in this process or in the process pool
+        :param matrix: sparse entity x feature matrix in csr form
+        :param output_loc: location of the memory mapped output the workers write into, None otherwise
+        :param top_k:
+        :return: iterator of (bounds, tile)
+        """
+        bounds = self.get_tile_bounds(matrix.shape[0], matrix.shape[0])
+        if self.processes is None or self.processes < 2 or len(bounds) < 2:
+            init_worker(matrix, None, top_k)
+            try:
+                for each in bounds:
+                    yield compute_tile_in_worker(each)
+            finally:
+                worker_state.clear()
+            return
+
+        with multiprocessing.Pool(self.processes, initializer=init_worker, initargs=(matrix, output_loc, top_k)) as pool:
+            for result in pool.imap_unordered(compute_tile_in_worker, bounds):
+                yield result
+
+    def compute(self, matrix, output=None):
+        """
+        Full similarity matrix
+        :param matrix: sparse entity x feature matrix
+        :param output: array to write the similarities into, a memory mapped .npy file keeps the result on the disk.
+        A new array is allocated when not passed.
+        :return: the filled output array
+        """
+        matrix = scipy.sparse.csr_matrix(matrix, dtype=numpy.float64)
+        if output is None:
+            output = numpy.zeros((matrix.shape[0], matrix.shape[0]))
+        output_loc = output.filename if isinstance(output, numpy.memmap) else None
+
+        for ((start, end), tile) in self.iterate_tiles(matrix, output_loc if self.processes else None, None):
+            if tile is not None:
+                output[start:end] = tile
+        if isinstance(output, numpy.memmap):
+            output.flush()
+
+        return output
+
+    def compute_top_k(self, matrix, top_k):
+        """
+        Sparse similarity matrix holding only the top_k most similar other rows of every row
+        :param matrix: sparse entity x feature matrix
+        :param top_k:
+        :return: csr matrix
+        """
+        matrix = scipy.sparse.csr_matrix(matrix, dtype=numpy.float64)
+        (rows, columns, values) = ([], [], [])
+        for (bounds, (tile_rows, tile_columns, tile_values)) in self.iterate_tiles(matrix, None, top_k):
+            rows.append(tile_rows)
+            columns.append(tile_columns)
+            values.append(tile_values)
+        if not rows:
+            return scipy.sparse.csr_matrix((matrix.shape[0], matrix.shape[0]))
+
+        return scipy.sparse.csr_matrix((numpy.concatenate(values), (numpy.concatenate(rows), numpy.concatenate(columns))),
+                                       shape=(matrix.shape[0], matrix.shape[0]))
@@ -1,35 +1,74 @@
 import os
 
 import numpy
+import pandas as pd
+import scipy.sparse
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
+from util import Util
 
 
 class CoactorCoactorMatrix(object):
     """
     Class to compute the Coactor Matrix which represents the number of movies each pair of actors have acted in, together
     """
+
+    BLOCK_SIZE = 10000
+
     def __init__(self):
         self.conf = ParseConfig()
         self.data_set_loc = os.path.join(os.path.abspath(os.path.dirname(__file__)),self.conf.config_section_mapper("filePath").get("data_set_loc"))
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
+        self.util = Util()
 
-    def fetchCoactorCoactorSimilarityMatrix(self):
+    def get_actor_movie_matrix(self):
         """
-        Creates the coactor matrix with all the actors in a given set
-        :return: coactor matrix
+        Binary actor x movie incidence matrix
+        :return: (sparse actor x movie matrix, sorted actor ids of the rows)
         """
         movie_actor_df = self.data_extractor.get_movie_actor_data()
-        movie_actor_set_df = movie_actor_df.groupby(['actorid'])["movieid"].apply(set).reset_index()
-        num_of_actors = len(movie_actor_df.actorid.unique())
-        coactor_matrix = [[0] * num_of_actors for i in range(num_of_actors)]
-        for index, movie_set in zip(movie_actor_set_df.index, movie_actor_set_df.movieid):
-            for index_2, movie_set_2 in zip(movie_actor_set_df.index, movie_actor_set_df.movieid):
-                if index != index_2:
-                    coactor_matrix[index][index_2] = len(movie_set.intersection(movie_set_2))
-
-        numpy.savetxt("coactor_coactor_matrix.csv", coactor_matrix, delimiter=",")
-        return coactor_matrix, movie_actor_set_df.actorid.unique()
+        actor_codes, actor_ids = pd.factorize(movie_actor_df.actorid.values, sort=True)
+        movie_codes, movie_ids = pd.factorize(movie_actor_df.movieid.values)
+        actor_movie_matrix = scipy.sparse.csr_matrix(
+            (numpy.ones(len(actor_codes), dtype=numpy.int32), (actor_codes, movie_codes)),
+            shape=(len(actor_ids), len(movie_ids)))
+        actor_movie_matrix.data[:] = 1
+
+        return actor_movie_matrix, numpy.asarray(actor_ids)
+
+    def build_coactor_matrix(self, top_k=None):
+        """
+        Creates the coactor matrix with all the actors in a given set, as the product of the actor movie
+        incidence matrix with its transpose. The rows are computed in blocks so that only the top_k coactors
+        of every actor need to be held when top_k is passed.
+        :param top_k: number of coactors to keep for every actor, all of them when not passed
+        :return: (sparse coactor matrix, sorted actor ids, sorted actor ids)
+        """
+        (actor_movie_matrix, actor_ids) = self.get_actor_movie_matrix()
+        movie_actor_matrix = actor_movie_matrix.transpose().tocsr()
+        blocks = []
+        for start in range(0, len(actor_ids), self.BLOCK_SIZE):
+            block = actor_movie_matrix[start:start + self.BLOCK_SIZE].dot(movie_actor_matrix).tocoo()
+            off_diagonal = block.row + start != block.col
+            block = scipy.sparse.csr_matrix((block.data[off_diagonal], (block.row[off_diagonal], block.col[off_diagonal])),
+                                            shape=block.shape)
+            if top_k is not None:
+                block = self.util.get_top_k_entries(block, top_k)
+            blocks.append(block)
+        coactor_matrix = scipy.sparse.vstack(blocks, format="csr")
+
+        return coactor_matrix, actor_ids, actor_ids
+
+    def fetchCoactorCoactorSimilarityMatrix(self, top_k=None):
+        """
+        Coactor matrix from the matrix store, built again only when movie-actor.csv or top_k changes
+        :param top_k: number of coactors to keep for every actor, all of them when not passed
+        :return: sparse coactor matrix, sorted actor ids
+        """
+        (coactor_matrix, actor_ids, column_ids) = self.data_extractor.get_stored_matrix(
+            "coactor_coactor_matrix", lambda: self.build_coactor_matrix(top_k), ["movie-actor.csv"], {"top_k": top_k})
+
+        return coactor_matrix, actor_ids
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy
+import pandas as pd
+
+
+class ColumnStore(object):
+    """
+    Class to persist data frames on the disk as directories of typed .npy column files.
+    Every entry records a fingerprint (mtime, size and sha1) of the files it was derived from,
+    so that it can be reused until one of those files changes.
+    """
+
+    META_FILE = "meta.json"
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+
+    def get_entry_path(self, name):
+        return os.path.join(self.store_path, name)
+
+    def get_file_hash(self, file_loc):
+        """
+        Compute the sha1 hash of a file, reading it in blocks
+        :param file_loc:
+        :return: hex digest
+        """
+        sha1 = hashlib.sha1()
+        with open(file_loc, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b""):
+                sha1.update(block)
+
+        return sha1.hexdigest()
+
+    def get_file_fingerprint(self, file_loc):
+        """
+        Fingerprint of a source file
+        :param file_loc:
+        :return: dictionary with the mtime, size and hash of the file
+        """
+        stat = os.stat(file_loc)
+
+        return {"path": os.path.abspath(file_loc), "mtime": stat.st_mtime, "size": stat.st_size,
+                "sha1": self.get_file_hash(file_loc)}
+
+    def read_meta(self, name):
+        meta_loc = os.path.join(self.get_entry_path(name), self.META_FILE)
+        if not os.path.isfile(meta_loc):
+            return None
+        try:
+            with open(meta_loc) as meta_file:
+                return json.load(meta_file)
+        except ValueError:
+            return None
+
+    def write_meta(self, name, meta):
+        meta_loc = os.path.join(self.get_entry_path(name), self.META_FILE)
+        temp_loc = meta_loc + ".tmp"
+        with open(temp_loc, "w") as meta_file:
+            json.dump(meta, meta_file, sort_keys=True, indent=4)
+        os.replace(temp_loc, meta_loc)
+
+    def is_fresh(self, name, sources, params=None):
+        """
+        Check whether the entry exists and was built from the current version of the source files.
+        A source whose mtime changed but whose content hash did not is still considered unchanged.
+        :param name: entry name
+        :param sources: list of source file locations
+        :param params: json serializable settings the entry was built with
+        :return: True if the entry can be reused
+        """
+        meta = self.read_meta(name)
+        if meta is None or meta.get("params") != params:
+            return False
+        recorded = {each["path"]: each for each in meta.get("sources", [])}
+        if set(recorded.keys()) != set(os.path.abspath(source) for source in sources):
+            return False
+
+        touched = False
+        for source in sources:
+            if not os.path.isfile(source):
+                return False
+            fingerprint = recorded[os.path.abspath(source)]
+            stat = os.stat(source)
+            if stat.st_size != fingerprint["size"]:
+                return False
+            if stat.st_mtime != fingerprint["mtime"]:
+                if self.get_file_hash(source) != fingerprint["sha1"]:
+                    return False
+                fingerprint["mtime"] = stat.st_mtime
+                touched = True
+
+        if touched:
+            try:
+                self.write_meta(name, meta)
+            except OSError:
+                pass
+
+        return True
+
+    def clear(self, name):
+        entry_path = self.get_entry_path(name)
+        if os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+    def load_array(self, file_loc):
+        """
+        Memory map a .npy file, falling back to a regular load when it cannot be mapped
+        :param file_loc:
+        :return: numpy array
+        """
+        try:
+            return numpy.load(file_loc, mmap_mode="r", allow_pickle=False)
+        except ValueError:
+            return numpy.load(file_loc, allow_pickle=False)
+
+    def save(self, name, data_frame, sources, params=None):
+        """
+        Write the data frame column by column. Numeric and datetime columns are saved as they are,
+        string and categorical columns are dictionary encoded into integer codes and their unique values.
+        The categories of a categorical column are saved with their own dtype, together with their order.
+        :param name: entry name
+        :param data_frame:
+        :param sources: list of files the data frame was derived from
+        :param params: json serializable settings the entry was built with
+        """
+        self.clear(name)
+        entry_path = self.get_entry_path(name)
+        os.makedirs(entry_path)
+
+        columns = []
+        for position, column in enumerate(data_frame.columns):
+            series = data_frame[column]
+            file_name = "col_%d" % position
+            column_meta = {}
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                kind = "category"
+                categories = series.cat.categories
+                numpy.save(os.path.join(entry_path, file_name + ".codes.npy"), series.cat.codes.values.astype(numpy.int32))
+                if categories.dtype == object:
+                    numpy.save(os.path.join(entry_path, file_name + ".values.npy"),
+                               numpy.array([str(each) for each in categories], dtype=str))
+                else:
+                    numpy.save(os.path.join(entry_path, file_name + ".values.npy"), categories.values)
+                column_meta = {"categories": str(categories.dtype), "ordered": bool(series.cat.ordered)}
+            elif series.dtype == object:
+                codes, uniques = pd.factorize(series)
+                kind = "strings"
+                numpy.save(os.path.join(entry_path, file_name + ".codes.npy"), codes.astype(numpy.int32))
+                numpy.save(os.path.join(entry_path, file_name + ".values.npy"),
+                           numpy.array([str(each) for each in uniques], dtype=str))
+            else:
+                kind = "array"
+                numpy.save(os.path.join(entry_path, file_name + ".npy"), series.values)
+            columns.append(dict(column_meta, name=column, file=file_name, kind=kind))
+
+        self.write_meta(name, {"columns": columns, "rows": len(data_frame.index), "params": params,
+                               "sources": [self.get_file_fingerprint(source) for source in sources]})
+
+    def load(self, name):
+        """
+        Rebuild the data frame of an entry from its memory mapped columns
+        :param name: entry name
+        :return: data frame
+        """
+        entry_path = self.get_entry_path(name)
+        meta = self.read_meta(name)
+        data = {}
+        for column in meta["columns"]:
+            column_loc = os.path.join(entry_path, column["file"])
+            if column["kind"] == "category":
+                values = numpy.load(column_loc + ".values.npy", allow_pickle=False)
+                if column.get("categories", "object") == "object":
+                    values = values.astype(object)
+                dtype = pd.CategoricalDtype(pd.Index(values), ordered=column.get("ordered", False))
+                data[column["name"]] = pd.Categorical.from_codes(self.load_array(column_loc + ".codes.npy"),
+                                                                 dtype=dtype)
+            elif column["kind"] == "strings":
+                codes = self.load_array(column_loc + ".codes.npy")
+                values = numpy.load(column_loc + ".values.npy", allow_pickle=False).astype(object)
+                data[column["name"]] = numpy.asarray(pd.Categorical.from_codes(codes, values), dtype=object)
+            else:
+                data[column["name"]] = self.load_array(column_loc + ".npy")
+
+        return pd.DataFrame(data, columns=[column["name"] for column in meta["columns"]],
+                            index=pd.RangeIndex(meta["rows"]), copy=False)
@@ -2,6 +2,7 @@ import logging
 import os
 
 import pandas as pd
+from column_store import ColumnStore
 from config_parser import ParseConfig
 
 logging.basicConfig(level=logging.INFO)
@@ -9,12 +10,131 @@ log = logging.getLogger(__name__)
 
 
 class DataExtractor(object):
-    def __init__(self, file_path):
+    TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    # Column types of the MovieLens/IMDB resources. Columns of files that are not listed here are inferred by pandas.
+    SCHEMAS = {
+        "movie-actor.csv": {"movieid": "int32", "actorid": "int32", "actor_movie_rank": "int16"},
+        "mltags.csv": {"userid": "int32", "movieid": "int32", "tagid": "int32", "timestamp": "datetime"},
+        "genome-tags.csv": {"tagId": "int32", "tag": "category"},
+        "mlmovies.csv": {"movieid": "int32", "moviename": "category", "year": "int16", "genres": "category"},
+        "imdb-actor-info.csv": {"id": "int32", "name": "category", "gender": "category"},
+        "mlratings.csv": {"movieid": "int32", "userid": "int32", "imdbid": "int32", "rating": "int8",
+                          "timestamp": "datetime"},
+        "mlusers.csv": {"userid": "int32"},
+    }
+
+    # Files the tasks write into the resources directory themselves, read from disk every time instead of
+    # being cached. None of the tasks of this phase write one.
+    WRITTEN_FILES = frozenset()
+
+    CHUNK_SIZE = 500000
+
+    def __init__(self, file_path, use_cache=True):
         self.file_path = file_path
+        self.column_store = ColumnStore(os.path.join(file_path, "cache")) if use_cache else None
+
+    def get_csv_dtypes(self, schema):
+        return {column: dtype for column, dtype in schema.items() if dtype != "datetime"}
+
+    def parse_timestamps(self, data_frame, schema):
+        for column, dtype in schema.items():
+            if dtype == "datetime" and column in data_frame.columns:
+                data_frame[column] = pd.to_datetime(data_frame[column], format=self.TIMESTAMP_FORMAT)
+
+        return data_frame
+
+    def read_csv(self, file_loc, schema):
+        """
+        Parse a csv file, applying the declared column types
+        :param file_loc:
+        :param schema: dictionary of column name to type, or None to let pandas infer the types
+        :return: data frame
+        """
+        if schema is None:
+            return pd.read_csv(file_loc)
+
+        data_frame = pd.read_csv(file_loc, dtype=self.get_csv_dtypes(schema))
+
+        return self.parse_timestamps(data_frame, schema)
+
+    def stream_data(self, file_name, chunk_size=None):
+        """
+        Read a csv file in 'resources' directory as fixed size chunks with the declared column types,
+        without loading the whole file in memory
+        :param file_name:
+        :param chunk_size: number of rows per chunk
+        :return: generator of data frames
+        """
+        file_loc = os.path.join(self.file_path, file_name)
+        schema = self.SCHEMAS.get(file_name, {})
+        reader = pd.read_csv(file_loc, dtype=self.get_csv_dtypes(schema), chunksize=chunk_size or self.CHUNK_SIZE)
+        for chunk in reader:
+            yield self.parse_timestamps(chunk, schema)
+
+    def get_rating_stats(self, ratings):
+        """
+        Number of ratings, sum of ratings and histogram of the ratings of every movie in a frame of ratings
+        :param ratings: data frame with the movieid and rating columns
+        :return: data frame indexed by movieid with the columns count, sum and rating_<value> for every rating value
+        """
+        rating = ratings["rating"].astype("int64")
+        stats = rating.groupby(ratings["movieid"]).agg(["count", "sum"])
+        histogram = rating.groupby([ratings["movieid"], rating]).size().unstack(fill_value=0)
+        histogram.columns = ["rating_%d" % value for value in histogram.columns]
+
+        return stats.join(histogram)
+
+    def merge_rating_stats(self, stats, new_stats):
+        """
+        Add up two rating statistics tables and recompute the average rating of the movies
+        :param stats: rating statistics, or None
+        :param new_stats: rating statistics to add
+        :return: data frame indexed by movieid with the columns count, sum, rating_<value> and mean
+        """
+        new_stats = new_stats.drop(columns="mean", errors="ignore")
+        if stats is not None:
+            new_stats = stats.drop(columns="mean", errors="ignore").add(new_stats, fill_value=0).fillna(0)
+        histogram_columns = sorted(new_stats.columns.drop(["count", "sum"]), key=lambda column: int(column[7:]))
+        merged = new_stats[["count", "sum"] + histogram_columns].astype("int64")
+        merged.index.name = "movieid"
+        merged["mean"] = merged["sum"] / merged["count"]
+
+        return merged
+
+    def get_movie_rating_aggregates(self, chunk_size=None):
+        """
+        Rating statistics of every movie, computed one chunk at a time in a single pass over the ratings
+        :param chunk_size:
+        :return: data frame indexed by movieid with the columns count, sum, rating_<value> (the number of ratings
+        of each value) and mean
+        """
+        aggregates = None
+        for chunk in self.stream_data("mlratings.csv", chunk_size):
+            aggregates = self.merge_rating_stats(aggregates, self.get_rating_stats(chunk))
+        if aggregates is None:
+            aggregates = self.merge_rating_stats(None, pd.DataFrame(columns=["count", "sum"], dtype="int64"))
+
+        return aggregates
 
     def data_extractor(self, file_name):  # return the data frame with respect to the csv file in 'resources' directory
         file_loc = os.path.join(self.file_path, file_name)
-        data_frame = pd.read_csv(file_loc)
+        schema = self.SCHEMAS.get(file_name)
+        if self.column_store is None or file_name in self.WRITTEN_FILES:
+            return self.read_csv(file_loc, schema)
+
+        cache_name = os.path.splitext(file_name)[0]
+        if self.column_store.is_fresh(cache_name, [file_loc], schema):
+            return self.column_store.load(cache_name)
+
+        data_frame = self.read_csv(file_loc, schema)
+        try:
+            self.column_store.save(cache_name, data_frame, [file_loc], schema)
+            data_frame = self.column_store.load(cache_name)
+        except OSError as error:
+            log.warning("Unable to cache %s: %s" % (file_name, error))
+            self.column_store.clear(cache_name)
+
         return data_frame
 
     def get_movie_actor_data(self):
@@ -1,6 +1,7 @@
 import logging
+import os
 
-import pandas as pd
+import numpy
 from config_parser import ParseConfig
 from phase1_task_1 import ActorTag
 
@@ -12,52 +13,43 @@ class GenreTag(ActorTag):
     """
         Class to relate Genre and tags, inherits the ActorTag to use the common weighing functons
     """
+
+    GENRE_DATA_FILES = ["mlmovies.csv", "genome-tags.csv", "mltags.csv"]
+
     def __init__(self):
         super().__init__()
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
 
-    def get_model_weight(self, tf_weight_dict, idf_weight_dict, tag_df, model):
+    def get_model_weight(self, tf_weights, idf_weights, tag_df, model):
         """
                This function combines tf_weight on a scale of 100, idf_weight on a scale of 100,
                and timestamp_weight on a scale of 10 , based on the model.
-               :param tf_weight_dict, idf_weight_dict, rank_weight_dict, tag_df, model
+               :param tf_weights, idf_weights: arrays of weights aligned with the rows of tag_df
+               :param tag_df, model
                :return: data_frame with column of the combined weight
         """
         if model == "TF":
-            tag_df["value"] = pd.Series(
-                [(ts_weight + tf_weight_dict.get(movieid, 0).get(tag, 0)) for
-                 index, ts_weight, tag, movieid
-                 in zip(tag_df.index, tag_df.timestamp_weight, tag_df.tag, tag_df.movieid)],
-                index=tag_df.index)
+            tag_df["value"] = tag_df.timestamp_weight.values + tf_weights
         else:
-            tag_df["value"] = pd.Series(
-                [(ts_weight + (tf_weight_dict.get(movieid, 0).get(tag, 0)*(idf_weight_dict.get(tag, 0)))) for
-                 index, ts_weight, tag, movieid
-                 in zip(tag_df.index, tag_df.timestamp_weight, tag_df.tag, tag_df.movieid)],
-                index=tag_df.index)
+            tag_df["value"] = tag_df.timestamp_weight.values + tf_weights * idf_weights
         return tag_df
 
     def combine_computed_weights(self, data_frame, model, genre):
         """
                 Triggers the weighing process and sums up all the calculated weights for each tag
                 :param data_frame:
-                :param rank_weight_dict:
                 :param model:
-                :return: dictionary of tags and weights
+                :param genre:
+                :return: data frame of the tags of the genre with their total weights
         """
-        tag_df = data_frame.reset_index()
         temp_df = data_frame[data_frame["genre"]==genre]
-        unique_tags = tag_df.tag.unique()
-        idf_data = tag_df.groupby(['movieid'])['tag'].apply(set)
-        tf_df = temp_df.groupby(['movieid'])['tag'].apply(lambda x: ','.join(x)).reset_index()
-        movie_tag_dict = dict(zip(tf_df.movieid, tf_df.tag))
-        tf_weight_dict = {movie: self.assign_tf_weight(tags.split(',')) for movie, tags in
-                          list(movie_tag_dict.items())}
-        idf_weight_dict = {}
+        tf_weights = self.tag_weighting.get_tf_weights(temp_df.movieid.values, temp_df.tag)
+        idf_weights = numpy.zeros(len(temp_df.index))
         if model != 'TF':
-            idf_weight_dict = self.assign_idf_weight(idf_data, unique_tags)
-        tag_df = self.get_model_weight(tf_weight_dict, idf_weight_dict, temp_df, model)
-        tag_df["total"] = tag_df.groupby(['movieid', 'tag'])['value'].transform('sum')
+            idf_weights = self.tag_weighting.get_row_weights(
+                self.tag_weighting.get_idf_weights(data_frame.movieid.values, data_frame.tag), temp_df.tag)
+        tag_df = self.get_model_weight(tf_weights, idf_weights, temp_df, model)
+        tag_df["total"] = tag_df.groupby(['movieid', 'tag'], observed=True)['value'].transform('sum')
         tag_df = tag_df.drop_duplicates(['movieid',"tag"]).sort_values("total", ascending=False)
         #actor_tag_dict = dict(zip(tag_df.tag, tag_df.total))
         return tag_df
@@ -78,6 +70,40 @@ class GenreTag(ActorTag):
         return data_frame
 
     def get_genre_data(self):
+        """
+                Genre tag data shared by all the task objects, built once per process by build_genre_data
+                and rebuilt only when one of the csv files it is derived from changes.
+                :return: data frame
+        """
+        return self.data_extractor.get_derived("genre_data", self.load_genre_data, self.GENRE_DATA_FILES)
+
+    def load_genre_data(self):
+        """
+                Loads the genre tag data from its artifact in the resources cache. The artifact is built first
+                when it is missing or one of the csv files it is derived from changed. The genre and tag columns
+                are stored dictionary encoded.
+                :return: data frame
+        """
+        column_store = self.data_extractor.column_store
+        if column_store is None:
+            return self.build_genre_data()
+
+        sources = [os.path.join(self.data_extractor.file_path, file_name) for file_name in self.GENRE_DATA_FILES]
+        params = {file_name: self.data_extractor.SCHEMAS.get(file_name) for file_name in self.GENRE_DATA_FILES}
+        if not column_store.is_fresh("genre_data", sources, params):
+            genre_tag_frame = self.build_genre_data()
+            try:
+                column_store.save("genre_data", genre_tag_frame.reset_index(), sources, params)
+            except OSError as error:
+                log.warning("Unable to cache the genre tag data: %s" % error)
+                column_store.clear("genre_data")
+                return genre_tag_frame
+
+        genre_tag_frame = column_store.load("genre_data").set_index("index")
+        genre_tag_frame.index.name = None
+        return genre_tag_frame
+
+    def build_genre_data(self):
         """
                 Merges data from different csv files necessary to compute the tag weights for each genre,
                 assigns weights to timestamp.
@@ -93,9 +119,7 @@ class GenreTag(ActorTag):
         genre_tag_frame = genre_tag_frame[["movieid", "moviename", "genre", "timestamp", "tagid", "tag"]]
         genre_tag_frame = genre_tag_frame.sort_values("timestamp", ascending=True)
         data_frame_len = len(genre_tag_frame.index)
-        genre_tag_frame["timestamp_weight"] = pd.Series(
-            [(index + 1) / data_frame_len * 10 for index in genre_tag_frame.index],
-            index=genre_tag_frame.index)
+        genre_tag_frame["timestamp_weight"] = (genre_tag_frame.index.values + 1) / data_frame_len * 10
         return genre_tag_frame
 
     def merge_genre_tag(self, genre, model):
@@ -32,7 +32,8 @@ class LdaGenreTag(GenreTag):
         tag_df = tag_df.sort_values('movieid')
         tag_df = list(tag_df.iloc[:,1])
 
-        (U, Vh) = self.util.LDA(tag_df, num_topics=4, num_features=1000)
+        (U, Vh) = self.util.LDA(tag_df, num_topics=4, num_features=1000, name="genre_tag_documents",
+                                file_names=self.GENRE_DATA_FILES, params={"genre": genre})
 
         for latent in Vh:
             print ("\n")
@@ -55,6 +56,8 @@ class SvdGenreTag(GenreTag):
         genre_tag_frame = self.get_genre_data()
         given_genre_frame = self.combine_computed_weights(genre_tag_frame, "TFIDF", genre)
         temp_df = given_genre_frame[["moviename", "tag", "total"]].drop_duplicates()
+        # plain strings keep the pivot sorted by movie name and tag, categoricals would keep them in appearance order
+        temp_df = temp_df.astype({"moviename": object, "tag": object})
         genre_tag_tfidf_df = temp_df.pivot(index='moviename', columns='tag', values='total')
         genre_tag_tfidf_df = genre_tag_tfidf_df.fillna(0)
 
@@ -66,7 +69,7 @@ class SvdGenreTag(GenreTag):
         column_headers = list(df)
         del column_headers[0]
 
-        (U, s, Vh) = self.util.SVD(df1)
+        (U, s, Vh) = self.util.SVD(df1, k=4)
 
         # To print latent semantics
         latents = self.util.get_latent_semantics(4, Vh)
@@ -95,6 +98,8 @@ class PcaGenreTag(GenreTag):
         genre_tag_frame = self.get_genre_data()
         given_genre_frame = self.combine_computed_weights(genre_tag_frame, "TFIDF", genre)
         temp_df = given_genre_frame[["moviename", "tag", "total"]].drop_duplicates()
+        # plain strings keep the pivot sorted by movie name and tag, categoricals would keep them in appearance order
+        temp_df = temp_df.astype({"moviename": object, "tag": object})
         genre_tag_tfidf_df = temp_df.pivot(index='moviename', columns='tag', values='total')
         genre_tag_tfidf_df = genre_tag_tfidf_df.fillna(0)
         genre_tag_tfidf_df.to_csv('genre_tag_matrix.csv', index = True , encoding='utf-8')
@@ -104,7 +109,7 @@ class PcaGenreTag(GenreTag):
         column_headers = list(df)
         del column_headers[0]
 
-        (U, s, Vh) = self.util.PCA(df1)
+        (U, s, Vh) = self.util.PCA(df1, k=4)
 
         # To print latent semantics
         latents = self.util.get_latent_semantics(4, Vh)
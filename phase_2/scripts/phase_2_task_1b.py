@@ -5,7 +5,7 @@ from collections import Counter
 
 import pandas as pd
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
 from phase1_task_2 import GenreTag
 from util import Util
 
@@ -19,7 +19,7 @@ class LdaGenreActor(GenreTag):
     def __init__(self):
         super().__init__()
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
 
     def get_lda_data(self, genre):
         """
@@ -52,7 +52,8 @@ class LdaGenreActor(GenreTag):
 
         actor_df = list(actor_df.iloc[:,1])
 
-        (U, Vh) = util.LDA(actor_df, num_topics=4, num_features=1000)
+        (U, Vh) = util.LDA(actor_df, num_topics=4, num_features=1000, name="genre_actor_documents",
+                           file_names=["mlmovies.csv", "movie-actor.csv"], params={"genre": genre})
 
         for latent in Vh:
             print ("\n")
@@ -68,7 +69,7 @@ class SvdGenreActor(GenreTag):
         Initialiazing the data extractor object to get data from the csv files
         """
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
 
     def split_genres(self, data_frame):
         """
@@ -233,7 +234,7 @@ class SvdGenreActor(GenreTag):
             col_head_name = util.get_actor_name_for_id(int(col_head))
             column_headers_names = column_headers_names + [col_head_name]
 
-        (U, s, Vh) = util.SVD(df1)
+        (U, s, Vh) = util.SVD(df1, k=4)
 
         # To print latent semantics
         latents = util.get_latent_semantics(4, Vh)
@@ -277,7 +278,7 @@ class PcaGenreActor(SvdGenreActor):
             col_head_name = util.get_actor_name_for_id(int(col_head))
             column_headers_names = column_headers_names + [col_head_name]
 
-        (U, s, Vh) = util.PCA(df1)
+        (U, s, Vh) = util.PCA(df1, k=4)
 
         # To print latent semantics
         latents = util.get_latent_semantics(4, Vh)
@@ -6,7 +6,7 @@ import numpy
 import pandas as pd
 from actor_actor_similarity_matrix import ActorActorMatrix
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
 from phase_2_task_1b import SvdGenreActor
 from util import Util
 
@@ -27,8 +27,7 @@ class SimilarActors(ActorActorMatrix):
         """
         super().__init__()
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
-        actor_actor_matrix_obj.fetchActorActorSimilarityMatrix()
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
 
     def get_actor_actor_vector(self, actorid):
         """
@@ -36,27 +35,17 @@ class SimilarActors(ActorActorMatrix):
         :param actorid:
         :return:
         """
-        (matrix, actorids) = self.fetchActorActorSimilarityMatrix()
-        #In the pre-processing task above command should be run so that actor_actor_similarity matrix will be generated
-        #and saved as csv which can be used multiple number of times. Will comment the above line, when its done.
-
-        # Loading the required actor_actor_similarity matrix from csv
-        df = pd.DataFrame(pd.read_csv('actor_actor_matrix.csv', header=None))
-        matrix = df.values
+        # Reading the row of the actor from the stored top k neighbour matrix, which is built again only when
+        # the data set changes; the actors outside the top k neighbours of the actor are left at zero
+        actor_row = self.get_actor_neighbour_row(actorid)
 
         actorids = util.get_sorted_actor_ids()
 
-        index_actor = None
-        for i,j in enumerate(actorids):
-            if j == actorid:
-                index_actor = i
-                break
-
-        if index_actor==None:
+        if actor_row is None:
             print ("Actor Id not found.")
             return None
 
-        actor_row = matrix[index_actor].tolist()
+        actor_row = actor_row.tolist()
         actor_actor_dict = dict(zip(actorids, actor_row))
         del actor_actor_dict[actorid]
 
@@ -80,14 +69,10 @@ class RelatedActorsSvd(SvdGenreActor):
         :return:
         """
 
-        actor_actor_matrix = actor_actor_matrix_obj.fetchActorActorSimilarityMatrix()
-
-
         # Loading the required dataset
-        df = pd.DataFrame(pd.read_csv('actor_tag_matrix.csv', header=None))
-        df1 = df.values
+        df1 = actor_actor_matrix_obj.get_stored_actor_tag_matrix()[0]
 
-        (U, s, Vh) = util.SVD(df1)
+        (U, s, Vh) = util.SVD(df1, k=5)
 
         actor_latent_matrix = U[:, :5]
 
@@ -139,14 +124,12 @@ class RelatedActorsPca():
         """
 
         # Loading the required dataset
-        df = pd.DataFrame(pd.read_csv('actor_tag_matrix.csv', header=None))
-        df1 = df.values
+        actor_tag_matrix = actor_actor_matrix_obj.get_stored_actor_tag_matrix()[0]
 
-        (U, s, Vh) = util.PCA(df1)
+        (U, s, Vh) = util.PCA(actor_tag_matrix, k=5)
 
         tag_latent_matrix = U[:, :5]
-        actor_tag_matrix = df1
-        actor_latent_matrix = numpy.dot(actor_tag_matrix, tag_latent_matrix)
+        actor_latent_matrix = actor_tag_matrix @ tag_latent_matrix
         actorids = util.get_sorted_actor_ids()
 
         latent_actor_matrix = actor_latent_matrix.transpose()
@@ -188,7 +171,7 @@ class LdaActorTag(object):
     def __init__(self):
         super().__init__()
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
         self.util = Util()
 
     def get_related_actors_lda(self, actorid):
@@ -205,14 +188,16 @@ class LdaActorTag(object):
         tag_data_frame = ml_tag.merge(genome_tag, how="left", left_on="tagid", right_on="tagId")
         merged_data_frame = tag_data_frame.merge(actor_movie_info, how="left", on="movieid")
 
-        merged_data_frame = merged_data_frame.fillna('')
+        categorical_columns = merged_data_frame.select_dtypes(include="category").columns
+        merged_data_frame = merged_data_frame.astype({column: object for column in categorical_columns}).fillna('')
         tag_df = merged_data_frame.groupby(['actorid'])['tag'].apply(list).reset_index()
 
         tag_df = tag_df.sort_values('actorid')
         actorid_list = tag_df.actorid.tolist()
         tag_df = list(tag_df.iloc[:,1])
 
-        (U, Vh) = self.util.LDA(tag_df, num_topics=5, num_features=1000)
+        (U, Vh) = self.util.LDA(tag_df, num_topics=5, num_features=1000, name="actor_tag_documents",
+                                file_names=ActorActorMatrix.ACTOR_TAG_DATA_FILES)
 
         actor_topic_matrix = self.util.get_doc_topic_matrix(U, num_docs=len(actorid_list), num_topics=5)
         topic_actor_matrix = actor_topic_matrix.transpose()
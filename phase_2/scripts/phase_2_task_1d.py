@@ -6,7 +6,7 @@ import numpy
 import pandas as pd
 from actor_actor_similarity_matrix import ActorActorMatrix
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
 from phase1_task_2 import GenreTag
 from util import Util
 
@@ -26,8 +26,7 @@ class SimilarActorsFromDiffMovies(ActorActorMatrix):
         """
         super().__init__()
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
-        actor_actor_matrix_obj.fetchActorActorSimilarityMatrix()
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
 
     def get_actors_of_movie(self, moviename):
         """
@@ -48,16 +47,11 @@ class SimilarActorsFromDiffMovies(ActorActorMatrix):
         """
         data_frame = genre_tag.get_genre_data()
         tag_df = data_frame.reset_index()
-        unique_tags = tag_df.tag.unique()
-        idf_data = tag_df.groupby(['movieid'])['tag'].apply(set)
-        tf_df = tag_df.groupby(['movieid'])['tag'].apply(lambda x: ','.join(x)).reset_index()
-        movie_tag_dict = dict(zip(tf_df.movieid, tf_df.tag))
-        tf_weight_dict = {movie: genre_tag.assign_tf_weight(tags.split(',')) for movie, tags in
-                          list(movie_tag_dict.items())}
-        idf_weight_dict = {}
-        idf_weight_dict = genre_tag.assign_idf_weight(idf_data, unique_tags)
-        tag_df = genre_tag.get_model_weight(tf_weight_dict, idf_weight_dict, tag_df, 'tfidf')
-        tag_df["total"] = tag_df.groupby(['movieid','tag'])['value'].transform('sum')
+        tf_weights = genre_tag.tag_weighting.get_tf_weights(tag_df.movieid.values, tag_df.tag)
+        idf_weights = genre_tag.tag_weighting.get_row_weights(
+            genre_tag.tag_weighting.get_idf_weights(tag_df.movieid.values, tag_df.tag), tag_df.tag)
+        tag_df = genre_tag.get_model_weight(tf_weights, idf_weights, tag_df, 'tfidf')
+        tag_df["total"] = tag_df.groupby(['movieid','tag'], observed=True)['value'].transform('sum')
         temp_df = tag_df[["moviename", "tag", "total"]].drop_duplicates().reset_index()
 
 
@@ -122,10 +116,7 @@ class SimilarActorsFromDiffMovies(ActorActorMatrix):
 
         actorsFinal = [x for x in actors if x not in actors_of_given_movie]
 
-        actornames = []
-        for actorid in actorsFinal:
-            actor = util.get_actor_name_for_id(actorid)
-            actornames.append(actor)
+        actornames = util.get_actor_names_for_ids(actorsFinal)
 
         return actornames
 
@@ -137,7 +128,7 @@ class SimilarActorsFromDiffMoviesSvd(object):
         """
         super().__init__()
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
         self.sim_act_diff_mov_tf = SimilarActorsFromDiffMovies()
 
     def most_similar_actors_svd(self, moviename):
@@ -152,7 +143,7 @@ class SimilarActorsFromDiffMoviesSvd(object):
         movies = list(movie_tag_frame.index.values)
         tags = list(movie_tag_frame)
 
-        (U,s,Vh) = util.SVD(movie_tag_matrix)
+        (U,s,Vh) = util.SVD(movie_tag_matrix, k=5)
 
         u_frame = pd.DataFrame(U[:, :5], index=movies)
         v_frame = pd.DataFrame(Vh[:5, :], columns=tags)
@@ -197,10 +188,7 @@ class SimilarActorsFromDiffMoviesSvd(object):
 
         actorsFinal = [x for x in actors if x not in actors_of_given_movie]
 
-        actornames = []
-        for actorid in actorsFinal:
-            actor = util.get_actor_name_for_id(actorid)
-            actornames.append(actor)
+        actornames = util.get_actor_names_for_ids(actorsFinal)
 
         return actornames
 
@@ -212,7 +200,7 @@ class SimilarActorsFromDiffMoviesPca(object):
         """
         super().__init__()
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
         self.sim_act_diff_mov_tf = SimilarActorsFromDiffMovies()
 
     def most_similar_actors_pca(self, moviename):
@@ -227,7 +215,7 @@ class SimilarActorsFromDiffMoviesPca(object):
         movies = list(movie_tag_frame.index.values)
         tags = list(movie_tag_frame)
 
-        (U,s,Vh) = util.PCA(movie_tag_matrix)
+        (U,s,Vh) = util.PCA(movie_tag_matrix, k=5)
 
         tag_latent_matrix = U[:, :5]
         movie_latent_matrix = numpy.dot(movie_tag_matrix, tag_latent_matrix)
@@ -269,10 +257,7 @@ class SimilarActorsFromDiffMoviesPca(object):
 
         actorsFinal = [x for x in actors if x not in actors_of_given_movie]
 
-        actornames = []
-        for actorid in actorsFinal:
-            actor = util.get_actor_name_for_id(actorid)
-            actornames.append(actor)
+        actornames = util.get_actor_names_for_ids(actorsFinal)
 
         return actornames
 
@@ -280,7 +265,7 @@ class SimilarActorsFromDiffMoviesLda(object):
     def __init__(self):
         super().__init__()
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
         self.util = Util()
         self.sim_act_diff_mov_tf = SimilarActorsFromDiffMovies()
 
@@ -304,7 +289,8 @@ class SimilarActorsFromDiffMoviesLda(object):
 
         input_movieid = self.util.get_movie_id(moviename)
 
-        (U, Vh) = self.util.LDA(tag_df, num_topics=5, num_features=1000)
+        (U, Vh) = self.util.LDA(tag_df, num_topics=5, num_features=1000, name="movie_tag_documents",
+                                file_names=GenreTag.GENRE_DATA_FILES)
 
         movie_topic_matrix = self.util.get_doc_topic_matrix(U, num_docs=len(movies), num_topics=5)
         topic_movie_matrix = movie_topic_matrix.transpose()
@@ -343,10 +329,7 @@ class SimilarActorsFromDiffMoviesLda(object):
 
         actorsFinal = [x for x in actors if x not in actors_of_given_movie]
 
-        actornames = []
-        for actorid in actorsFinal:
-            actor = self.util.get_actor_name_for_id(actorid)
-            actornames.append(actor)
+        actornames = self.util.get_actor_names_for_ids(actorsFinal)
 
         return actornames
 
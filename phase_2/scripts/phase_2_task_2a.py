@@ -14,11 +14,7 @@ class ActorActorSVD(object):
         Fetches List of Actors Names
         :return: List of Actor Names
         """
-        actor_names_list = []
-        for actor in self.actor_ids:
-            actor_names_list.append(self.util.get_actor_name_for_id(actor))
-
-        return actor_names_list
+        return self.util.get_actor_names_for_ids(self.actor_ids)
 
     def get_partitions(self, no_of_partitions):
         """
@@ -3,11 +3,14 @@ from util import Util
 
 
 class CoactorCoactorSVD(object):
-    def __init__(self):
+    def __init__(self, rank=3):
+        """
+        :param rank: number of latent semantics computed from the sparse coactor matrix
+        """
         self.util = Util()
         self.coactor_coactor_matrix_object = CoactorCoactorMatrix()
         self.coactor_coactor_similarity_matrix, self.actor_ids = self.coactor_coactor_matrix_object.fetchCoactorCoactorSimilarityMatrix()
-        self.u, self.s, self.vt = self.util.SVD(self.coactor_coactor_similarity_matrix)
+        self.u, self.s, self.vt = self.util.SVD(self.coactor_coactor_similarity_matrix, k=rank)
 
 
     def get_actor_names_list(self):
@@ -15,11 +18,7 @@ class CoactorCoactorSVD(object):
                 Fetches List of Actors Names
                 :return: List of Actor Names
         """
-        actor_names_list = []
-        for actor in self.actor_ids:
-            actor_names_list.append(self.util.get_actor_name_for_id(actor))
-
-        return actor_names_list
+        return self.util.get_actor_names_for_ids(self.actor_ids)
 
     def get_partitions(self, no_of_partitions):
         """
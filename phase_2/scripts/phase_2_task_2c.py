@@ -1,7 +1,6 @@
-import numpy as np
-
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
+from sparse_tensor import SparseTensor
 from util import Util
 
 
@@ -10,7 +9,7 @@ class ActorMovieYearTensor(object):
     def __init__(self):
         self.conf = ParseConfig()
         self.data_set_loc = self.conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
         self.ordered_years = []
         self.ordered_movie_names = []
         self.ordered_actor_names = []
@@ -22,54 +21,16 @@ class ActorMovieYearTensor(object):
     def fetchActorMovieYearTensor(self):
         """
         Create actor movie year tensor
-        :return: tensor
+        :return: sparse tensor
         """
         movies_df = self.data_extractor.get_mlmovies_data()
         actor_df = self.data_extractor.get_movie_actor_data()
 
         movie_actor_df = actor_df.merge(movies_df, how="left", on="movieid")
-        year_list = movie_actor_df["year"]
-        year_count = 0
-        year_dict = {}
-        for element in year_list:
-            if element in year_dict.keys():
-                continue
-            year_dict[element] = year_count
-            year_count += 1
-            self.ordered_years.append(element)
-
-        movieid_list = movie_actor_df["movieid"]
-        movieid_count = 0
-        movieid_dict = {}
-        for element in movieid_list:
-            if element in movieid_dict.keys():
-                continue
-            movieid_dict[element] = movieid_count
-            movieid_count += 1
-            name = self.util.get_movie_name_for_id(element)
-            self.ordered_movie_names.append(name)
-
-        actorid_list = movie_actor_df["actorid"]
-        actorid_count = 0
-        actorid_dict = {}
-        for element in actorid_list:
-            if element in actorid_dict.keys():
-                continue
-            actorid_dict[element] = actorid_count
-            actorid_count += 1
-            name = self.util.get_actor_name_for_id(element)
-            self.ordered_actor_names.append(name)
-
-        tensor = np.zeros((year_count, movieid_count, actorid_count))
-
-        for index, row in movie_actor_df.iterrows():
-            year = row["year"]
-            movieid = row["movieid"]
-            actorid = row["actorid"]
-            year_id = year_dict[year]
-            movieid_id = movieid_dict[movieid]
-            actorid_id = actorid_dict[actorid]
-            tensor[year_id][movieid_id][actorid_id] = 1
+        tensor = SparseTensor.from_data_frame(movie_actor_df, ["year", "movieid", "actorid"], sort=False)
+        (self.ordered_years, movieids, actorids) = tensor.labels
+        self.ordered_movie_names = self.util.get_movie_names_for_ids(movieids)
+        self.ordered_actor_names = self.util.get_actor_names_for_ids(actorids)
 
         return tensor
 
@@ -1,7 +1,8 @@
-import numpy as np
-
+import numpy
+import pandas as pd
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
+from sparse_tensor import SparseTensor
 from util import Util
 
 
@@ -9,7 +10,7 @@ class TagMovieRatingTensor(object):
     def __init__(self):
         self.conf = ParseConfig()
         self.data_set_loc = self.conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
         self.max_ratings = 5
         self.ordered_ratings = [0, 1, 2, 3, 4, 5]
         self.ordered_movie_names = []
@@ -21,43 +22,22 @@ class TagMovieRatingTensor(object):
 
     def fetchTagMovieRatingTensor(self):
         """
-        Create tag movie rating tensor
-        :return: tensor
+        Create tag movie rating tensor, setting every rating up to the average rating of the movie
+        :return: sparse tensor
         """
-        mltags_df = self.data_extractor.get_mltags_data()
-
-        tag_id_list = mltags_df["tagid"]
-        tag_id_count = 0
-        tag_id_dict = {}
-        for element in tag_id_list:
-            if element in tag_id_dict.keys():
-                continue
-            tag_id_dict[element] = tag_id_count
-            tag_id_count += 1
-            name = self.util.get_tag_name_for_id(element)
-            self.ordered_tag_names.append(name)
-
-        movieid_list = mltags_df["movieid"]
-        movieid_count = 0
-        movieid_dict = {}
-        for element in movieid_list:
-            if element in movieid_dict.keys():
-                continue
-            movieid_dict[element] = movieid_count
-            movieid_count += 1
-            name = self.util.get_movie_name_for_id(element)
-            self.ordered_movie_names.append(name)
-
-        tensor = np.zeros((tag_id_count, movieid_count, self.max_ratings + 1))
-
-        for index, row in mltags_df.iterrows():
-            tagid = row["tagid"]
-            movieid = row["movieid"]
-            avg_movie_rating = self.util.get_average_ratings_for_movie(movieid)
-            for rating in range(0, int(avg_movie_rating) + 1):
-                tagid_id = tag_id_dict[tagid]
-                movieid_id = movieid_dict[movieid]
-                tensor[tagid_id][movieid_id][rating] = 1
+        mltags_df = self.data_extractor.get_mltags_data()[["tagid", "movieid"]]
+
+        (movie_codes, movieids) = pd.factorize(mltags_df["movieid"])
+        average_ratings = numpy.array(self.util.get_average_ratings_for_movies(movieids))
+        num_ratings = average_ratings.astype(int)[movie_codes] + 1
+        rating_df = mltags_df.iloc[numpy.repeat(numpy.arange(len(mltags_df)), num_ratings)].copy()
+        rating_df["rating"] = numpy.arange(num_ratings.sum()) - numpy.repeat(numpy.cumsum(num_ratings) - num_ratings,
+                                                                               num_ratings)
+
+        tensor = SparseTensor.from_data_frame(rating_df, ["tagid", "movieid", "rating"],
+                                              labels={"rating": self.ordered_ratings}, sort=False)
+        self.ordered_tag_names = self.util.get_tag_names_for_ids(tensor.labels[0])
+        self.ordered_movie_names = self.util.get_movie_names_for_ids(tensor.labels[1])
 
         return tensor
 
@@ -1,13 +1,13 @@
 import argparse
 import logging
-import operator
 from util import Util
 import numpy
 import pandas as pd
 from actor_actor_similarity_matrix import ActorActorMatrix
 from coactor_coactor_matrix import CoactorCoactorMatrix
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
+from page_rank import PageRank
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -17,48 +17,67 @@ conf = ParseConfig()
 
 class PageRankActor(ActorActorMatrix):
     """Class to calculate Personalised PageRank"""
-    def __init__(self):
+    def __init__(self, epsilon=None):
         super().__init__()
+        self.epsilon = epsilon
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
-        self.actor_matrix, self.actorids = self.fetchActorActorSimilarityMatrix()
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
         self.coactor_obj = CoactorCoactorMatrix()
-        self.coactor_matrix, self.coactorids = self.coactor_obj.fetchCoactorCoactorSimilarityMatrix()
         self.util = Util()
+        self.page_rank = PageRank()
+        (self.actor_transition, self.actor_dangling, self.actorids) = self.get_actor_graph()
+        (self.coactor_transition, self.coactor_dangling, self.coactorids) = self.get_coactor_graph()
 
-    def get_transition_dataframe(self, data_frame):
+    def build_actor_graph(self):
+        """
+        Top k neighbour matrix of the actors the actor graph is built from, every actor linking to its top_k
+        most similar actors
+        :return: (sparse actor x actor matrix, sorted actor ids)
+        """
+        actor_matrix, actorids = self.fetchActorNeighbourMatrix()
+        return actor_matrix, actorids.values
+
+    def get_actor_graph(self):
+        """
+        Transition matrix of the actor neighbour graph from the matrix store, built again only when
+        one of the resource files of the actor tag vectors or top_k changes
+        :return: (sparse column stochastic transition matrix, boolean array of the dangling nodes, sorted actor ids)
+        """
+        return self.page_rank.get_stored_graph(self.data_extractor, "actor_actor_graph", self.build_actor_graph,
+                                               self.ACTOR_TAG_DATA_FILES, {"top_k": self.top_k})
+
+    def get_coactor_graph(self):
+        """
+        Transition matrix of the coactor graph from the matrix store, built again only when movie-actor.csv changes
+        :return: (sparse column stochastic transition matrix, boolean array of the dangling nodes, sorted actor ids)
+        """
+        return self.page_rank.get_stored_graph(self.data_extractor, "coactor_coactor_graph",
+                                               self.coactor_obj.fetchCoactorCoactorSimilarityMatrix,
+                                               ["movie-actor.csv"])
+
+    def get_transition_matrix(self, actor_matrix):
         """
         Function to get the transition matrix for Random walk
-        :param data_frame:
-        :return: transition matrix
-        """
-        for column in data_frame:
-            data_frame[column] = pd.Series(
-                [0 if ind == int(column) else each for ind, each in zip(data_frame.index, data_frame[column])],
-                index=data_frame.index)
-        data_frame["row_sum"] = data_frame.sum(axis=1)
-        for column in data_frame:
-            data_frame[column] = pd.Series(
-                [each / sum if (column != "row_sum" and each > 0 and ind != int(column) and sum!=0) else each for ind, each, sum in
-                 zip(data_frame.index, data_frame[column], data_frame.row_sum)],
-                index=data_frame.index)
-        data_frame = data_frame.drop(["row_sum"], axis=1)
-        data_frame.loc[(data_frame.T == 0).all()] = float(1 / (len(data_frame.columns)))
-        data_frame = data_frame.transpose()
-        return data_frame
+        :param actor_matrix: actor x actor similarity matrix, dense or sparse
+        :return: (sparse column stochastic transition matrix, boolean array of the dangling nodes)
+        """
+        return self.page_rank.build_transition_matrix(actor_matrix)
 
-    def get_seed_matrix(self, transition_df, seed_actors, actorids):
+    def get_seed_matrix(self, num_nodes, seed_actors, actorids):
         """
         Function to get the Restart matrix for entries in the seed list
-        :param transition_df:
+        :param num_nodes:
         :param seed_actors:
         :param actorids:
         :return: seed_matrix
         """
-        seed_matrix = [0.0 for each in range(len(transition_df.columns))]
+        seed_matrix = numpy.zeros(num_nodes)
         seed_value = float(1 / len(seed_actors))
-        for each in seed_actors:
-            seed_matrix[list(actorids).index(each)] = seed_value
+        seed_positions = pd.Index(actorids).get_indexer(seed_actors)
+        if (seed_positions < 0).any():
+            missing = [seed for seed, position in zip(seed_actors, seed_positions) if position < 0]
+            raise ValueError("Seed actors not in the graph: %s" % missing)
+        seed_matrix[seed_positions] = seed_value
         return seed_matrix
 
     def print_actors_and_pageranks(self, page_rank_tuple):
@@ -73,17 +92,29 @@ class PageRankActor(ActorActorMatrix):
         :param actorids:
         :return:
         """
-        data_frame = pd.DataFrame(actor_matrix)
-        transition_df = self.get_transition_dataframe(data_frame)
-        seed_matrix = self.get_seed_matrix(transition_df, seed_actors, actorids)
-        result_list = seed_matrix
-        temp_list = []
-        while(temp_list!=result_list):
-            temp_list = result_list
-            result_list = list(0.85*numpy.matmul(numpy.array(transition_df.values), numpy.array(result_list))+ 0.15*numpy.array(seed_matrix))
-        page_rank_dict = {i: j for i, j in zip(actorids, result_list)}
-        sorted_rank = sorted(page_rank_dict.items(), key=operator.itemgetter(1), reverse=True)
-        self.print_actors_and_pageranks(sorted_rank[0:len(seed_actors)+10])
+        (transition, dangling) = self.get_transition_matrix(actor_matrix)
+        self.compute_graph_pagerank(seed_actors, transition, dangling, actorids)
+
+    def compute_graph_pagerank(self, seed_actors, transition, dangling, actorids):
+        """
+        Function to compute the Personalised Pagerank over a transition matrix that is already built
+        :param seed_actors:
+        :param transition: sparse column stochastic transition matrix
+        :param dangling: boolean array of the dangling nodes
+        :param actorids:
+        :return:
+        """
+        seed_matrix = self.get_seed_matrix(transition.shape[0], seed_actors, actorids)
+        if self.epsilon is None:
+            (scores, num_of_iter, residual) = self.page_rank.power_iteration(transition, dangling, seed_matrix)
+            log.info("PageRank stopped after %d iterations with residual %g" % (num_of_iter, residual))
+        else:
+            (scores, touched) = self.page_rank.get_approximate_scores(transition, dangling, seed_matrix,
+                                                                      self.epsilon)
+            log.info("Forward push touched %d of %d actors" % (touched, transition.shape[0]))
+        actorids = numpy.asarray(actorids)
+        top = self.page_rank.get_top_k(scores, len(seed_actors) + 10)
+        self.print_actors_and_pageranks(zip(actorids[top].tolist(), scores[top].tolist()))
 
     def compute_actors_pagerank(self, seed_list):
         """
@@ -91,7 +122,7 @@ class PageRankActor(ActorActorMatrix):
         :param seed_list:
         :return:
         """
-        self.compute_pagerank(seed_list, self.actor_matrix, self.actorids)
+        self.compute_graph_pagerank(seed_list, self.actor_transition, self.actor_dangling, self.actorids)
 
     def compute_coactors_pagerank(self, seed_list):
         """
@@ -99,14 +130,16 @@ class PageRankActor(ActorActorMatrix):
          :param seed_list:
          :return:
         """
-        self.compute_pagerank(seed_list, self.coactor_matrix, self.coactorids)
+        self.compute_graph_pagerank(seed_list, self.coactor_transition, self.coactor_dangling, self.coactorids)
 
 if __name__ == "__main__":
-    PRA = PageRankActor()
     parser = argparse.ArgumentParser(description='phase_2_task_3.py Actor/Coactor seed_actors')
     parser.add_argument('type', action="store", type=str, choices=set(("actor", "coactor")))
     parser.add_argument('seed_actors', action="store", type=str)
+    parser.add_argument('--epsilon', action="store", type=float, default=None,
+                        help="approximate PageRank by forward push with this residual threshold per edge, such as 1e-6")
     input = vars(parser.parse_args())
+    PRA = PageRankActor(epsilon=input['epsilon'])
     type = input['type']
     seed_actors = input['seed_actors']
     seed_actor_list = [int(each) for each in seed_actors.split(",")]
@@ -2,7 +2,7 @@ import argparse
 from collections import Counter
 
 import config_parser
-import data_extractor
+import dataset_context
 from util import Util
 
 
@@ -10,7 +10,7 @@ class UserMovieRecommendation(object):
     def __init__(self):
         self.conf = config_parser.ParseConfig()
         self.data_set_loc = self.conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = data_extractor.DataExtractor(self.data_set_loc)
+        self.data_extractor = dataset_context.DatasetContext.get_context(self.data_set_loc)
         self.mlmovies = self.data_extractor.get_mlmovies_data()
         self.mltags = self.data_extractor.get_mltags_data()
         self.mlmovies = self.data_extractor.get_mlmovies_data()
@@ -93,10 +93,9 @@ class UserMovieRecommendation(object):
         :param movie_list:
         :return: movie having the highest average rating
         """
-        ratings = {}
-        for movie in movie_list:
-            movie_id = self.util.get_movie_id(movie)
-            ratings[movie] = self.util.get_average_ratings_for_movie(movie_id)
+        movie_list = list(movie_list)
+        movie_ratings = self.util.get_average_ratings_for_movies(self.util.get_movie_ids(movie_list))
+        ratings = dict(zip(movie_list, movie_ratings))
 
         max_movie = ""
         max_rating = -1
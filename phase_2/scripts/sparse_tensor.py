@@ -0,0 +1,67 @@
+import numpy
+import pandas as pd
+
+
+class SparseTensor(object):
+    """
+    Sparse three way (or n way) tensor in coordinate form: one row of mode indices and one value per non zero
+    entry, with the label of every index of every mode. The labels of a mode are the distinct values of a
+    column of a data frame, numbered by pd.factorize in one vectorized step, so no dense tensor is allocated
+    unless the dense view is asked for.
+    """
+
+    def __init__(self, indices, values, labels):
+        """
+        :param indices: entries x modes array of the positions of the non zero entries
+        :param values: value of every non zero entry
+        :param labels: list holding the labels of every mode, their positions being the indices
+        """
+        self.indices = indices
+        self.values = values
+        self.labels = labels
+        self.shape = tuple(len(mode_labels) for mode_labels in labels)
+
+    @classmethod
+    def from_data_frame(cls, data_frame, columns, values=None, labels=None, sort=True):
+        """
+        Tensor of the rows of a data frame, with one mode per column. Rows repeating the same entry are
+        set once, the way assigning the entry of every row sets it.
+        :param data_frame:
+        :param columns: column of every mode
+        :param values: column holding the value of every entry, 1 for every entry when not passed
+        :param labels: dictionary from column to the labels of its mode, for modes that are not the distinct
+        values of the column. Rows whose value is not one of these labels are left out.
+        :param sort: number the distinct values in sorted order, in order of first appearance otherwise
+        :return: sparse tensor
+        """
+        labels = labels if labels is not None else {}
+        keep = numpy.ones(len(data_frame), dtype=bool)
+        mode_indices = []
+        mode_labels = []
+        for column in columns:
+            if column in labels:
+                uniques = pd.Index(labels[column])
+                codes = uniques.get_indexer(data_frame[column])
+            else:
+                (codes, uniques) = pd.factorize(data_frame[column], sort=sort)
+            keep &= codes >= 0
+            mode_indices.append(codes)
+            mode_labels.append(list(uniques))
+
+        indices = numpy.column_stack(mode_indices)[keep]
+        entry_values = numpy.ones(len(indices)) if values is None else \
+            numpy.asarray(data_frame[values], dtype=numpy.float64)[keep]
+        (indices, first) = numpy.unique(indices[::-1], axis=0, return_index=True)
+
+        return cls(indices, entry_values[::-1][first], mode_labels)
+
+    def to_dense(self, dtype=numpy.float64):
+        """
+        Dense view of the tensor
+        :param dtype:
+        :return: numpy array of the shape of the tensor
+        """
+        tensor = numpy.zeros(self.shape, dtype=dtype)
+        tensor[tuple(self.indices.T)] = self.values
+
+        return tensor
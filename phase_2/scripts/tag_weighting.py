@@ -0,0 +1,103 @@
+import math
+
+import numpy
+import pandas as pd
+
+
+class TagWeighting(object):
+    """
+    Vectorized kernels for the tf, idf, actor rank and timestamp weights of the tag models.
+    Every kernel works on whole columns at once and returns the same numbers as weighing one row at a time.
+    """
+
+    def get_pair_codes(self, document_keys, terms):
+        """
+        Integer codes of the documents, of the terms and of the (document, term) pairs of every row
+        :param document_keys: document (movie) of every row
+        :param terms: term (tag) of every row
+        :return: (document codes, number of documents, term codes, unique terms, pair codes)
+        """
+        document_codes, documents = pd.factorize(document_keys)
+        term_codes, unique_terms = pd.factorize(terms)
+        pair_codes = document_codes.astype(numpy.int64) * len(unique_terms) + term_codes
+
+        return document_codes, len(documents), term_codes, numpy.asarray(unique_terms, dtype=object), pair_codes
+
+    def get_log_ratios(self, numerator, denominators):
+        """
+        log2(numerator / denominator) for an array of denominators, computed with math.log on the distinct
+        denominators so that the values match math.log exactly
+        :param numerator:
+        :param denominators: array of positive integers
+        :return: array of logarithms
+        """
+        unique_denominators, denominator_index = numpy.unique(denominators, return_inverse=True)
+        logs = numpy.array([math.log(numerator / denominator, 2) for denominator in unique_denominators],
+                           dtype=numpy.float64)
+
+        return logs[denominator_index]
+
+    def get_tf_weights(self, document_keys, terms):
+        """
+        Term frequency of every row, the share of the rows of its document having its term
+        :param document_keys: document (movie) of every row
+        :param terms: term (tag) of every row
+        :return: array of tf weights aligned with the rows
+        """
+        (document_codes, num_documents, term_codes, unique_terms, pair_codes) = self.get_pair_codes(document_keys, terms)
+        (pairs, pair_index, pair_counts) = numpy.unique(pair_codes, return_inverse=True, return_counts=True)
+        document_counts = numpy.bincount(document_codes, minlength=num_documents)
+
+        return pair_counts[pair_index] / document_counts[document_codes]
+
+    def get_idf_weights(self, document_keys, terms, num_documents=None):
+        """
+        Inverse document frequency of every term, log2(number of documents / number of documents having the term)
+        :param document_keys: document (movie) of every row
+        :param terms: term (tag) of every row
+        :param num_documents: number of documents, the number of distinct document keys when not passed
+        :return: series of idf weights indexed by term
+        """
+        (document_codes, documents_seen, term_codes, unique_terms, pair_codes) = self.get_pair_codes(document_keys, terms)
+        num_terms = len(unique_terms)
+        if num_terms == 0:
+            return pd.Series([], index=pd.Index([], dtype=object), dtype=numpy.float64)
+        document_counts = numpy.bincount(numpy.unique(pair_codes) % num_terms, minlength=num_terms)
+        if num_documents is None:
+            num_documents = documents_seen
+
+        return pd.Series(self.get_log_ratios(num_documents, document_counts), index=pd.Index(unique_terms))
+
+    def get_row_weights(self, weights, terms):
+        """
+        Look up the weight of the term of every row, 0 for the terms without a weight
+        :param weights: series of weights indexed by term
+        :param terms: term of every row
+        :return: array of weights aligned with the rows
+        """
+        if len(weights.index) == 0:
+            return numpy.zeros(len(terms))
+
+        return weights.reindex(numpy.asarray(terms, dtype=object)).fillna(0).values
+
+    def get_rank_weights(self, movie_keys, ranks):
+        """
+        Weight of the actor rank of every row on a scale of 100, (max rank of the movie - rank + 1) / max rank * 100
+        :param movie_keys: movie of every row
+        :param ranks: actor rank of every row
+        :return: array of rank weights aligned with the rows
+        """
+        ranks = pd.Series(numpy.asarray(ranks))
+        max_ranks = ranks.groupby(numpy.asarray(movie_keys)).transform("max").values
+        ranks = ranks.values
+
+        return (max_ranks - ranks + 1) / max_ranks * 100
+
+    def get_timestamp_weights(self, positions, num_rows):
+        """
+        Weight of every row on a scale of 10 from its position in the timestamp order, (position + 1) / rows * 10
+        :param positions: position of every row
+        :param num_rows:
+        :return: array of timestamp weights
+        """
+        return (numpy.asarray(positions) + 1) / num_rows * 10
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy
+from page_rank import PageRank
+
+
+class ForwardPushTest(unittest.TestCase):
+    """
+    Forward push against power iteration on a small weighted directed graph. Nodes 0 to 4 form a cluster, node 5
+    is dangling and only reached from node 4, nodes 6 and 7 form a component of their own.
+    """
+
+    def setUp(self):
+        self.page_rank = PageRank(tolerance=1e-15)
+        weights = numpy.zeros((8, 8))
+        for (source, target, weight) in [(0, 1, 2.0), (1, 0, 1.0), (1, 2, 1.0), (2, 0, 3.0), (2, 3, 1.0),
+                                         (3, 1, 1.0), (3, 4, 2.0), (4, 0, 1.0), (4, 5, 1.0), (6, 7, 1.0),
+                                         (7, 6, 2.0)]:
+            weights[source, target] = weight
+        (self.transition, self.dangling) = self.page_rank.build_transition_matrix(weights)
+
+    def get_seed_vector(self, seeds):
+        seed_vector = numpy.zeros(self.transition.shape[0])
+        seed_vector[seeds] = 1.0 / len(seeds)
+
+        return seed_vector
+
+    def assert_matches_power_iteration(self, seeds):
+        seed_vector = self.get_seed_vector(seeds)
+        exact = self.page_rank.power_iteration(self.transition, self.dangling, seed_vector)[0]
+        (scores, touched) = self.page_rank.get_approximate_scores(self.transition, self.dangling, seed_vector,
+                                                                  epsilon=1e-13)
+
+        numpy.testing.assert_allclose(scores, exact, rtol=0, atol=1e-10)
+
+    def test_dangling_node(self):
+        self.assertEqual(numpy.flatnonzero(self.dangling).tolist(), [5])
+
+    def test_seeds_reaching_the_dangling_node(self):
+        self.assert_matches_power_iteration([0, 2])
+
+    def test_seed_on_the_dangling_node(self):
+        self.assert_matches_power_iteration([5])
+
+    def test_push_stays_in_the_component_of_the_seeds(self):
+        self.assert_matches_power_iteration([6])
+        (positions, values, spread, touched) = self.page_rank.forward_push(
+            self.page_rank.get_push_graph(self.transition), self.dangling, self.get_seed_vector([6]), epsilon=1e-13)
+
+        self.assertEqual(positions.tolist(), [6, 7])
+        self.assertEqual(spread, 0)
+        self.assertEqual(touched, 2)
+
+    def test_residual_threshold(self):
+        seed_vector = self.get_seed_vector([0])
+        exact = self.page_rank.power_iteration(self.transition, self.dangling, seed_vector)[0]
+        for epsilon in [1e-2, 1e-4, 1e-6]:
+            (scores, touched) = self.page_rank.get_approximate_scores(self.transition, self.dangling, seed_vector,
+                                                                      epsilon)
+            # every node is left holding less than epsilon times its out degree of unpushed mass
+            self.assertLessEqual(numpy.abs(scores - exact).sum(), epsilon * self.transition.nnz)
+            self.assertTrue((scores <= exact + 1e-12).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import logging
+import os
+import shutil
+
+import gensim
+import numpy
+import scipy.sparse
+from gensim.matutils import dirichlet_expectation
+
+log = logging.getLogger(__name__)
+
+
+class TopicModel(object):
+    """
+    LDA over tag documents with a choice of backend. "single" trains gensim's LdaModel in the calling process,
+    "multicore" trains LdaMulticore with a number of worker processes. The dictionary and the bag of words corpus
+    of a named list of documents are built once and serialized in Matrix Market format under the corpus path,
+    keyed by the fingerprint of the resource files the documents come from, so that later fits of the same
+    documents read the corpus back instead of building it. A fitted model can fold new documents in with online
+    updates instead of being trained again.
+    """
+
+    BACKENDS = ("single", "multicore")
+
+    def __init__(self, backend="single", workers=None, passes=20, corpus_path=None):
+        """
+        :param backend: "single" or "multicore"
+        :param workers: number of worker processes of the multicore backend, one less than the cpus when not passed
+        :param passes: number of passes over the corpus when fitting
+        :param corpus_path: directory of the serialized corpora, the corpus is kept in memory when not passed
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown LDA backend %s" % backend)
+        self.backend = backend
+        self.workers = workers
+        self.passes = passes
+        self.corpus_path = corpus_path
+        self.dictionary = None
+        self.lda = None
+
+    def build_corpus(self, documents):
+        dictionary = gensim.corpora.Dictionary(documents)
+
+        return dictionary, [dictionary.doc2bow(document) for document in documents]
+
+    def get_corpus(self, documents, name=None, key=None):
+        """
+        Dictionary and bag of words corpus of a list of documents, serialized the first time they are asked for.
+        The bags of words are streamed into the corpus file as they are built, and the dictionary is saved last,
+        so a corpus whose writing was interrupted is built again. Writing the corpus of a new key drops the
+        corpora of the other keys of the same name. The corpus is read back into memory, the passes over a
+        streamed corpus parsing the file again every time.
+        :param documents: list of lists of tokens
+        :param name: name of the documents, the corpus is not serialized when not passed
+        :param key: fingerprint of the resource files and settings the documents are built from
+        :return: (dictionary, corpus)
+        """
+        if self.corpus_path is None or name is None or key is None:
+            return self.build_corpus(documents)
+        name_path = os.path.join(self.corpus_path, name)
+        entry_path = os.path.join(name_path, key)
+        dictionary_loc = os.path.join(entry_path, "dictionary")
+        corpus_loc = os.path.join(entry_path, "corpus.mm")
+
+        if not os.path.isfile(dictionary_loc):
+            dictionary = gensim.corpora.Dictionary(documents)
+            try:
+                if os.path.isdir(name_path):
+                    shutil.rmtree(name_path, ignore_errors=True)
+                os.makedirs(entry_path, exist_ok=True)
+                gensim.corpora.MmCorpus.serialize(corpus_loc, (dictionary.doc2bow(document) for document in documents),
+                                                  id2word=dictionary)
+                dictionary.save(dictionary_loc)
+            except OSError as error:
+                log.warning("Unable to serialize the corpus: %s" % error)
+                return dictionary, [dictionary.doc2bow(document) for document in documents]
+
+        return gensim.corpora.Dictionary.load(dictionary_loc), list(gensim.corpora.MmCorpus(corpus_loc))
+
+    def fit(self, documents, num_topics, name=None, key=None):
+        """
+        Train the model on a list of documents
+        :param documents: list of lists of tokens
+        :param num_topics:
+        :param name: name of the documents, see get_corpus
+        :param key: fingerprint of the resource files and settings the documents are built from
+        :return: bag of words corpus of the documents
+        """
+        (self.dictionary, corpus) = self.get_corpus(documents, name, key)
+        if self.backend == "multicore":
+            self.lda = gensim.models.ldamulticore.LdaMulticore(corpus, num_topics, id2word=self.dictionary,
+                                                               passes=self.passes, workers=self.workers)
+        else:
+            self.lda = gensim.models.ldamodel.LdaModel(corpus, num_topics, id2word=self.dictionary,
+                                                       passes=self.passes)
+
+        return corpus
+
+    def update(self, documents):
+        """
+        Fold new documents into the fitted model with an online update. The vocabulary of the model is fixed,
+        so tokens it has not seen are left out of the new documents.
+        :param documents: list of lists of tokens
+        :return: bag of words corpus of the new documents
+        """
+        if self.lda is None:
+            raise ValueError("The topic model has to be fitted before it is updated")
+        corpus = [self.dictionary.doc2bow(document) for document in documents]
+        self.lda.update(corpus)
+
+        return corpus
+
+    def infer_gamma(self, chunk):
+        """
+        Variational E step of the fitted model for a chunk of documents, the one gensim runs document by document,
+        vectorized over the whole chunk: the words of all the documents are laid out as one sparse documents x
+        words matrix, and a document stops being updated once its gamma has converged. It reads the same
+        attributes of the model as LdaModel.inference, and test_topic_model checks that the two agree.
+        :param chunk: list of bag of words documents
+        :return: documents x topics variational parameters
+        """
+        lda = self.lda
+        lengths = numpy.array([len(document) for document in chunk])
+        indptr = numpy.concatenate([[0], numpy.cumsum(lengths)])
+        ids = numpy.fromiter((word for document in chunk for (word, count) in document), dtype=numpy.intp,
+                             count=indptr[-1])
+        counts = numpy.fromiter((count for document in chunk for (word, count) in document), dtype=lda.dtype,
+                                count=indptr[-1])
+        rows = numpy.repeat(numpy.arange(len(chunk)), lengths)
+        word_topics = lda.expElogbeta[:, ids].T
+        epsilon = numpy.finfo(lda.dtype).eps
+
+        gamma = lda.random_state.gamma(100., 1. / 100., (len(chunk), lda.num_topics)).astype(lda.dtype, copy=False)
+        exp_e_log_theta = numpy.exp(dirichlet_expectation(gamma))
+        active = numpy.arange(len(chunk))
+        for iteration in range(lda.iterations):
+            phinorm = numpy.einsum("ij,ij->i", exp_e_log_theta[rows], word_topics) + epsilon
+            weights = scipy.sparse.csr_matrix((counts / phinorm, ids, indptr), shape=(len(chunk), lda.num_terms))
+            new_gamma = lda.alpha + exp_e_log_theta[active] * (weights[active] @ lda.expElogbeta.T)
+            changes = numpy.abs(new_gamma - gamma[active]).mean(axis=1)
+            gamma[active] = new_gamma
+            exp_e_log_theta[active] = numpy.exp(dirichlet_expectation(new_gamma))
+            active = active[changes >= lda.gamma_threshold]
+            if len(active) == 0:
+                break
+
+        return gamma
+
+    def get_doc_topic_matrix(self, corpus, dtype=numpy.float64, chunksize=2000):
+        """
+        Topic distribution of every document of a bag of words corpus, inferred a chunk of documents at a time
+        instead of one by one. Topics below the minimum probability of the model are left at zero, the way gensim
+        leaves them out of the distribution of a single document.
+        :param corpus: list of bag of words documents
+        :param dtype: dtype of the matrix
+        :param chunksize: number of documents inferred together
+        :return: documents x topics matrix
+        """
+        topic_matrix = numpy.zeros((len(corpus), self.lda.num_topics), dtype=dtype)
+        for start in range(0, len(corpus), chunksize):
+            gamma = self.infer_gamma(corpus[start:start + chunksize])
+            topic_matrix[start:start + len(gamma)] = gamma / gamma.sum(axis=1, keepdims=True)
+        topic_matrix[topic_matrix < max(self.lda.minimum_probability, 1e-8)] = 0
+
+        return topic_matrix
+
+    def convert_doc_topic_corpus(self, topic_corpus, num_docs, num_topics, dtype=numpy.float64):
+        """
+        Documents x topics matrix of a corpus of (topic id, probability) lists, converted in one pass by gensim
+        :param topic_corpus: iterable of the topic distributions of the documents
+        :param num_docs:
+        :param num_topics:
+        :param dtype: dtype of the matrix
+        :return: dense documents x topics matrix
+        """
+        topic_matrix = gensim.matutils.corpus2csc(topic_corpus, num_terms=num_topics, num_docs=num_docs, dtype=dtype)
+
+        return topic_matrix.T.toarray()
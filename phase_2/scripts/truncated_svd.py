@@ -0,0 +1,85 @@
+import numpy
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
+
+class TruncatedSVD(object):
+    """
+    Rank k singular value decomposition of dense or sparse matrices, for callers that only use the first few
+    components, computed by ARPACK (Lanczos). It is exact to machine precision even when the k-th singular value
+    is close to the ones after it, as it is for the tag matrices, and falls back to the full decomposition when
+    the rank is not smaller than the matrix. Signs are fixed so that the largest entry of every left singular
+    vector is positive, which makes the result reproducible.
+    """
+
+    def __init__(self, random_state=0):
+        """
+        :param random_state: seed of the starting vector of ARPACK
+        """
+        self.random_state = random_state
+
+    def flip_signs(self, U, s, Vh):
+        """
+        Turn every pair of singular vectors so that the largest entry of the left one is positive
+        :param U:
+        :param s:
+        :param Vh:
+        :return: (U, s, Vh)
+        """
+        signs = numpy.sign(U[numpy.argmax(numpy.abs(U), axis=0), numpy.arange(U.shape[1])])
+        signs[signs == 0] = 1
+
+        return U * signs, s, Vh * signs[:, numpy.newaxis]
+
+    def as_float_matrix(self, matrix):
+        """
+        :param matrix: dense array, scipy sparse matrix or linear operator
+        :return: the matrix with float64 entries, linear operators are returned as they are
+        """
+        if isinstance(matrix, scipy.sparse.linalg.LinearOperator):
+            return matrix
+        if scipy.sparse.issparse(matrix):
+            return matrix.astype(numpy.float64)
+
+        return numpy.asarray(matrix, dtype=numpy.float64)
+
+    def full(self, matrix, k):
+        """
+        First k components of the full decomposition, for ranks close to the size of the matrix
+        :param matrix: dense array, scipy sparse matrix or linear operator
+        :param k:
+        :return: (U, s, Vh)
+        """
+        if scipy.sparse.issparse(matrix):
+            matrix = matrix.toarray()
+        elif isinstance(matrix, scipy.sparse.linalg.LinearOperator):
+            matrix = matrix.matmat(numpy.eye(matrix.shape[1]))
+        U, s, Vh = scipy.linalg.svd(matrix, full_matrices=False)
+
+        return self.flip_signs(U[:, :k], s[:k], Vh[:k])
+
+    def lanczos(self, matrix, k):
+        """
+        First k components computed by ARPACK
+        :param matrix: dense array, scipy sparse matrix or linear operator
+        :param k: smaller than both sides of the matrix
+        :return: (U, s, Vh), singular values in descending order
+        """
+        matrix = self.as_float_matrix(matrix)
+        v0 = numpy.random.RandomState(self.random_state).uniform(-1, 1, min(matrix.shape))
+        U, s, Vh = scipy.sparse.linalg.svds(matrix, k=k, v0=v0)
+        order = numpy.argsort(s)[::-1]
+
+        return self.flip_signs(U[:, order], s[order], Vh[order])
+
+    def decompose(self, matrix, k):
+        """
+        Rank k decomposition
+        :param matrix: dense array, scipy sparse matrix or linear operator
+        :param k: number of components
+        :return: (U, s, Vh), singular values in descending order
+        """
+        if k >= min(matrix.shape):
+            return self.full(matrix, k)
+
+        return self.lanczos(matrix, k)
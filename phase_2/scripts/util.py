@@ -1,14 +1,17 @@
 import math
 import os
 
-import gensim
 import numpy
+import scipy.sparse
 import tensorly.tensorly.decomposition as decomp
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
-from gensim import corpora
+from dataset_context import DatasetContext
+from principal_components import PrincipalComponents
 from scipy import linalg
 from sklearn.preprocessing import StandardScaler
+from sparse_tensor import SparseTensor
+from topic_model import TopicModel
+from truncated_svd import TruncatedSVD
 import logging
 logging.getLogger("gensim").setLevel(logging.CRITICAL)
 
@@ -18,12 +21,35 @@ class Util(object):
     """
     def __init__(self):
         self.conf = ParseConfig()
+        self.truncated_svd = TruncatedSVD()
+        self.topic_model = None
         self.data_set_loc = os.path.join(os.path.abspath(os.path.dirname(__file__)), self.conf.config_section_mapper("filePath").get("data_set_loc"))
-        self.data_extractor = DataExtractor(self.data_set_loc)
-        self.mlratings = self.data_extractor.get_mlratings_data()
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
+        self.movie_ratings = self.data_extractor.get_movie_rating_stats()
         self.mlmovies = self.data_extractor.get_mlmovies_data()
         self.imdb_actor_info = self.data_extractor.get_imdb_actor_info_data()
         self.genome_tags = self.data_extractor.get_genome_tags_data()
+        self.movie_id_index = self.data_extractor.get_derived(
+            "movie_id_index", lambda: self.build_lookup_index(self.mlmovies, 'moviename', 'movieid'), ["mlmovies.csv"])
+        self.movie_name_index = self.data_extractor.get_derived(
+            "movie_name_index", lambda: self.build_lookup_index(self.mlmovies, 'movieid', 'moviename'), ["mlmovies.csv"])
+        self.actor_name_index = self.data_extractor.get_derived(
+            "actor_name_index", lambda: self.build_lookup_index(self.imdb_actor_info, 'id', 'name'),
+            ["imdb-actor-info.csv"])
+        self.tag_name_index = self.data_extractor.get_derived(
+            "tag_name_index", lambda: self.build_lookup_index(self.genome_tags, 'tagId', 'tag'), ["genome-tags.csv"])
+
+    def build_lookup_index(self, data_frame, key_column, value_column):
+        """
+        Build a dictionary from every key to the value of the first row holding that key
+        :param data_frame:
+        :param key_column:
+        :param value_column:
+        :return: dictionary of key to value
+        """
+        unique_rows = data_frame.drop_duplicates(key_column)
+
+        return dict(zip(unique_rows[key_column], unique_rows[value_column]))
 
     def get_sorted_actor_ids(self):
         """
@@ -41,11 +67,15 @@ class Util(object):
         :param movie:
         :return: movie id
         """
-        all_movie_data = self.mlmovies
-        movie_data = all_movie_data[all_movie_data['moviename'] == movie]
-        movie_id = movie_data['movieid'].unique()
+        return self.movie_id_index[movie]
 
-        return movie_id[0]
+    def get_movie_ids(self, movies):
+        """
+        Obtain the IDs for a list of movie names
+        :param movies:
+        :return: list of movie ids
+        """
+        return [self.movie_id_index[movie] for movie in movies]
 
     def get_average_ratings_for_movie(self, movie_id):
         """
@@ -53,27 +83,34 @@ class Util(object):
         :param movie_id:
         :return: average movie rating
         """
-        all_ratings = self.mlratings
-        movie_ratings = all_ratings[all_ratings['movieid'] == movie_id]
-
-        ratings_sum = 0
-        ratings_count = 0
-        for index, row in movie_ratings.iterrows():
-            ratings_count += 1
-            ratings_sum += row['rating']
+        ratings_sum = self.movie_ratings["sum"].get(movie_id, 0)
+        ratings_count = self.movie_ratings["count"].get(movie_id, 0)
 
         return ratings_sum / float(ratings_count)
 
+    def get_average_ratings_for_movies(self, movie_ids):
+        """
+        Obtain average ratings for a list of movies
+        :param movie_ids:
+        :return: list of average movie ratings
+        """
+        return [self.get_average_ratings_for_movie(movie_id) for movie_id in movie_ids]
+
     def get_actor_name_for_id(self, actor_id):
         """
         actor name for id
         :param actor_id:
         :return: actor name for the actor id
         """
-        actor_data = self.imdb_actor_info[self.imdb_actor_info['id'] == actor_id]
-        name = actor_data['name'].unique()
+        return self.actor_name_index[actor_id]
 
-        return name[0]
+    def get_actor_names_for_ids(self, actor_ids):
+        """
+        actor names for a list of actor ids
+        :param actor_ids:
+        :return: list of actor names
+        """
+        return [self.actor_name_index[actor_id] for actor_id in actor_ids]
 
     def get_movie_name_for_id(self, movieid):
         """
@@ -81,11 +118,15 @@ class Util(object):
         :param movieid:
         :return: movie name
         """
-        all_movie_data = self.mlmovies
-        movie_data = all_movie_data[all_movie_data['movieid'] == movieid]
-        movie_name = movie_data['moviename'].unique()
+        return self.movie_name_index[movieid]
 
-        return movie_name[0]
+    def get_movie_names_for_ids(self, movieids):
+        """
+        movie names for a list of movie ids
+        :param movieids:
+        :return: list of movie names
+        """
+        return [self.movie_name_index[movieid] for movieid in movieids]
 
     def get_tag_name_for_id(self, tag_id):
         """
@@ -93,10 +134,32 @@ class Util(object):
         :param tag_id:
         :return: tag name
         """
-        tag_data = self.genome_tags[self.genome_tags['tagId'] == tag_id]
-        name = tag_data['tag'].unique()
+        return self.tag_name_index[tag_id]
+
+    def get_tag_names_for_ids(self, tag_ids):
+        """
+        tag names for a list of tag ids
+        :param tag_ids:
+        :return: list of tag names
+        """
+        return [self.tag_name_index[tag_id] for tag_id in tag_ids]
+
+    def get_top_k_entries(self, matrix, k):
+        """
+        Keep the k largest entries of every row of a sparse matrix, ties go to the lower column
+        :param matrix: sparse matrix
+        :param k: number of entries to keep in every row
+        :return: csr matrix
+        """
+        matrix = scipy.sparse.csr_matrix(matrix)
+        matrix.sum_duplicates()
+        rows = numpy.repeat(numpy.arange(matrix.shape[0]), numpy.diff(matrix.indptr))
+        order = numpy.lexsort((matrix.indices, -matrix.data, rows))
+        ranks = numpy.empty(len(order), dtype=numpy.int64)
+        ranks[order] = numpy.arange(len(order)) - matrix.indptr[rows[order]]
+        keep = ranks < k
 
-        return name[0]
+        return scipy.sparse.csr_matrix((matrix.data[keep], (rows[keep], matrix.indices[keep])), shape=matrix.shape)
 
     def partition_factor_matrix(self, matrix, no_of_partitions, entity_names):
         """
@@ -181,19 +244,24 @@ class Util(object):
     def CPDecomposition(self, tensor, rank):
         """
         Perform CP Decomposition
-        :param tensor:
+        :param tensor: dense array, or sparse tensor whose dense view is decomposed
         :param rank:
         :return: factor matrices obtained after decomposition
         """
+        if isinstance(tensor, SparseTensor):
+            tensor = tensor.to_dense()
         factors = decomp.parafac(tensor, rank)
         return factors
 
-    def SVD(self, matrix):
+    def SVD(self, matrix, k=None):
         """
         Perform SVD
-        :param matrix:
+        :param matrix: dense array or scipy sparse matrix
+        :param k: number of singular values to compute, all of them when not passed
         :return: factor matrices and the core matrix
         """
+        if k is not None:
+            return self.truncated_svd.decompose(matrix, k)
 
         # Calculating SVD
         # Feature Scaling
@@ -202,67 +270,104 @@ class Util(object):
         U, s, Vh = linalg.svd(matrix, full_matrices=False)
         return (U, s, Vh)
 
-    def PCA(self, matrix):
+    def get_covariance(self, matrix):
+        """
+        Covariance of the columns of the matrix. A sparse matrix is not centered in place,
+        the covariance is computed from its gram matrix and column means.
+        :param matrix: dense array or scipy sparse matrix
+        :return: covariance matrix
+        """
+        if not scipy.sparse.issparse(matrix):
+            return numpy.cov(matrix, rowvar=False)
+
+        num_rows = matrix.shape[0]
+        means = numpy.asarray(matrix.mean(axis=0)).ravel()
+        gram = (matrix.T @ matrix).toarray()
+
+        return (gram - num_rows * numpy.outer(means, means)) / (num_rows - 1)
+
+    def PCA(self, matrix, k=None):
         """
         Perform PCA
-        :param matrix:
+        :param matrix: dense array or scipy sparse matrix
+        :param k: number of principal components to keep, all of them when not passed. The first k components
+        are computed from the implicitly centered matrix, without forming the covariance matrix.
         :return: factor matrices and the core matrix
         """
+        if k is not None:
+            (components, variances) = PrincipalComponents(self.truncated_svd).fit(matrix, k)
+            return components.T, variances, components
 
-        #sc = StandardScaler()
-        #df_sc = sc.fit_transform(matrix[:, :])
+        cov_df = self.get_covariance(matrix)
+        U, s, Vh = numpy.linalg.svd(cov_df)
 
-        # Computng covariance matrix
-        cov_df = numpy.cov(matrix, rowvar=False)
-
-        # Calculating PCA
-        U, s, Vh = linalg.svd(cov_df)
-        return (U, s, Vh)
+        return U, s, Vh
 
-    def LDA(self, input_compound_list, num_topics, num_features):
+    def LDA(self, input_compound_list, num_topics, num_features, name=None, file_names=None, params=None,
+            backend=None, workers=None):
         """
         Perform LDA
         :param input_compound_list:
         :param num_topics:
         :param num_features:
+        :param name: name of the documents, their corpus is serialized once per version of the resource files
+        when it is passed together with file_names
+        :param file_names: resource files the documents are built from
+        :param params: json serializable settings the documents are built with
+        :param backend: "single" for LdaModel, "multicore" for LdaMulticore, backend of the lda section of
+        config.ini when not passed
+        :param workers: number of worker processes of the multicore backend, workers of the lda section of
+        config.ini when not passed
         :return: topics and object topic distribution
         """
-        # turn our tokenized documents into a id <-> term dictionary
-        dictionary = corpora.Dictionary(input_compound_list)
-
-        # convert tokenized documents into a document-term matrix
-        corpus = [dictionary.doc2bow(text) for text in input_compound_list]
-
-        # generate LDA model
-        lda = gensim.models.ldamodel.LdaModel(corpus, num_topics, id2word=dictionary, passes=20)
-
-        latent_semantics = lda.print_topics(num_topics, num_features)
+        settings = self.conf.config_section_mapper("lda") if self.conf.config.has_section("lda") else {}
+        if backend is None:
+            backend = settings.get("backend") or "single"
+        if workers is None and settings.get("workers"):
+            workers = int(settings.get("workers"))
+        key = None
+        if name is not None and file_names is not None:
+            key = self.data_extractor.get_sources_key(name, file_names, params)
+        self.topic_model = TopicModel(backend, workers, corpus_path=self.data_extractor.corpus_path)
+        corpus = self.topic_model.fit(input_compound_list, num_topics, name, key)
+
+        latent_semantics = self.topic_model.lda.print_topics(num_topics, num_features)
         # for latent in latent_semantics:
         #     print(latent)
 
-        corpus = lda[corpus]
+        corpus = self.topic_model.lda[corpus]
 
         # for i in corpus:
         #     print(i)
 
         return corpus, latent_semantics
 
-    def get_doc_topic_matrix(self, u, num_docs, num_topics):
+    def update_LDA(self, input_compound_list, num_features):
+        """
+        Fold new documents into the model of the last LDA call with an online update, instead of retraining it
+        :param input_compound_list: documents of the new objects
+        :param num_features:
+        :return: new object topic distribution and updated topics
+        """
+        corpus = self.topic_model.update(input_compound_list)
+        latent_semantics = self.topic_model.lda.print_topics(self.topic_model.lda.num_topics, num_features)
+
+        return self.topic_model.lda[corpus], latent_semantics
+
+    def get_doc_topic_matrix(self, u, num_docs, num_topics, dtype=numpy.float64):
         """
         Reconstructing data
-        :param u:
+        :param u: topic distributions returned by LDA or update_LDA
         :param num_docs:
         :param num_topics:
+        :param dtype: numpy.float32 halves the matrix and the dense products computed from it
         :return: reconstructed data
         """
-        u_matrix = numpy.zeros(shape=(num_docs, num_topics))
-
-        for i in range(0, len(u)):
-            row1 = u[i]
-            for j in range(0, len(row1)):
-                u_matrix[i, j] = row1[j][1]
+        topic_model = self.topic_model
+        if topic_model is not None and getattr(u, "obj", None) is topic_model.lda and len(u.corpus) == num_docs:
+            return topic_model.get_doc_topic_matrix(u.corpus, dtype)
 
-        return u_matrix
+        return TopicModel().convert_doc_topic_corpus(u, num_docs, num_topics, dtype)
 
 
 if __name__ == "__main__":
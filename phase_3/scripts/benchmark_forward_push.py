@@ -0,0 +1,94 @@
+import argparse
+import logging
+import time
+
+import numpy
+import scipy.sparse
+from page_rank import PageRank
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+
+class ForwardPushBenchmark(object):
+    """
+    Compare the forward push approximation of Personalised PageRank against power iteration
+    on a synthetic weighted graph: work done, nodes touched and agreement of the top k nodes
+    """
+
+    def __init__(self, num_nodes, degree, num_seeds, seed=0):
+        self.page_rank = PageRank()
+        self.random = numpy.random.RandomState(seed)
+        (self.transition, self.dangling) = self.page_rank.build_transition_matrix(
+            self.build_graph(num_nodes, degree))
+        self.seed_vector = numpy.zeros(num_nodes)
+        self.seed_vector[self.random.choice(num_nodes, num_seeds, replace=False)] = 1.0 / num_seeds
+
+    def build_graph(self, num_nodes, degree):
+        """
+        Symmetric graph with random positive weights, made of small clusters joined by random edges.
+        The last few nodes are left without edges to exercise the dangling nodes.
+        :param num_nodes:
+        :param degree: average number of edges of a node
+        :return: sparse node x node weight matrix
+        """
+        num_edges = num_nodes * degree // 2
+        connected = num_nodes - max(num_nodes // 1000, 1)
+        rows = self.random.randint(0, connected, num_edges)
+        clustered = self.random.rand(num_edges) < 0.8
+        columns = numpy.where(clustered, (rows // 100) * 100 + self.random.randint(0, 100, num_edges),
+                              self.random.randint(0, connected, num_edges))
+        columns = numpy.minimum(columns, connected - 1)
+        weights = self.random.rand(num_edges)
+        matrix = scipy.sparse.coo_matrix((weights, (rows, columns)), shape=(num_nodes, num_nodes))
+
+        return (matrix + matrix.T).tocsr()
+
+    def run(self, epsilons, top_k, min_overlap):
+        """
+        Solve the graph exactly once and approximately for every epsilon, checking that the top k nodes of
+        the finest approximation agree with the exact ones
+        :param epsilons:
+        :param top_k:
+        :param min_overlap: smallest fraction of the exact top k the finest approximation has to find
+        :return: list of (epsilon, seconds, touched nodes, top k overlap, L1 error)
+        """
+        start = time.perf_counter()
+        (exact, iterations, residual) = self.page_rank.power_iteration(self.transition, self.dangling,
+                                                                       self.seed_vector)
+        log.info("Power iteration: %.3f s, %d iterations over %d nodes", time.perf_counter() - start, iterations,
+                 len(exact))
+        exact_top = set(self.page_rank.get_top_k(exact, top_k).tolist())
+
+        results = []
+        for epsilon in sorted(epsilons, reverse=True):
+            start = time.perf_counter()
+            (scores, touched) = self.page_rank.get_approximate_scores(self.transition, self.dangling,
+                                                                      self.seed_vector, epsilon)
+            seconds = time.perf_counter() - start
+            overlap = len(exact_top & set(self.page_rank.get_top_k(scores, top_k).tolist())) / float(len(exact_top))
+            error = numpy.abs(scores - exact).sum()
+            log.info("Forward push epsilon %g: %.3f s, %d nodes touched, top %d overlap %.2f, L1 error %.2e",
+                     epsilon, seconds, touched, top_k, overlap, error)
+            results.append((epsilon, seconds, touched, overlap, error))
+
+        if results[-1][3] < min_overlap:
+            raise ValueError("Forward push found only %.2f of the top %d nodes" % (results[-1][3], top_k))
+
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='benchmark_forward_push.py --nodes 200000',
+    )
+    parser.add_argument('--nodes', action="store", type=int, default=200000)
+    parser.add_argument('--degree', action="store", type=int, default=20)
+    parser.add_argument('--seeds', action="store", type=int, default=5)
+    parser.add_argument('--top_k', action="store", type=int, default=20)
+    parser.add_argument('--epsilons', action="store", type=str, default="1e-4,1e-5,1e-6,1e-7,1e-8")
+    parser.add_argument('--min_overlap', action="store", type=float, default=0.9)
+    parser.add_argument('--seed', action="store", type=int, default=0)
+    input = vars(parser.parse_args())
+    benchmark = ForwardPushBenchmark(input['nodes'], input['degree'], input['seeds'], input['seed'])
+    benchmark.run([float(each) for each in input['epsilons'].split(",")], input['top_k'], input['min_overlap'])
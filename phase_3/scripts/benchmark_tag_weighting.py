@@ -0,0 +1,134 @@
+import argparse
+import logging
+import math
+import time
+from collections import Counter
+
+import numpy
+import pandas as pd
+from tag_weighting import TagWeighting
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+
+class TagWeightingBenchmark(object):
+    """
+    Compare the vectorized tag weighting kernels against the row by row weighing they replaced,
+    on a synthetic tag log
+    """
+
+    def __init__(self, num_rows, num_movies, num_tags, max_rank, seed=0):
+        self.tag_weighting = TagWeighting()
+        self.tag_log = self.build_tag_log(num_rows, num_movies, num_tags, max_rank, seed)
+
+    def build_tag_log(self, num_rows, num_movies, num_tags, max_rank, seed):
+        """
+        Synthetic tag log with a movie, a tag, an actor rank and a timestamp position on every row
+        :param num_rows:
+        :param num_movies:
+        :param num_tags:
+        :param max_rank:
+        :param seed:
+        :return: data frame
+        """
+        random = numpy.random.RandomState(seed)
+        tags = numpy.array(["tag_%d" % each for each in range(num_tags)], dtype=object)
+
+        return pd.DataFrame({"movieid": random.randint(1, num_movies + 1, num_rows),
+                             "tag": tags[random.randint(0, num_tags, num_rows)],
+                             "actor_movie_rank": random.randint(1, max_rank + 1, num_rows),
+                             "position": random.permutation(num_rows)})
+
+    def reference_weights(self):
+        """
+        Row by row weighing with counters and dictionaries, the way the tag models used to do it
+        :return: dictionary of weight arrays
+        """
+        movies = self.tag_log.movieid.values.tolist()
+        tags = self.tag_log.tag.values.tolist()
+        ranks = self.tag_log.actor_movie_rank.values.tolist()
+        positions = self.tag_log.position.values.tolist()
+        num_rows = len(movies)
+
+        movie_tags = {}
+        for movie, tag in zip(movies, tags):
+            movie_tags.setdefault(movie, []).append(tag)
+
+        tf_dict = {}
+        for movie, tag_list in movie_tags.items():
+            counter = Counter(tag_list)
+            tf_dict[movie] = {tag: count / len(tag_list) for tag, count in counter.items()}
+
+        document_counts = Counter()
+        for tag_list in movie_tags.values():
+            document_counts.update(set(tag_list))
+        idf_dict = {tag: math.log(len(movie_tags) / count, 2) for tag, count in document_counts.items()}
+
+        max_ranks = {}
+        for movie, rank in zip(movies, ranks):
+            if rank > max_ranks.get(movie, 0):
+                max_ranks[movie] = rank
+
+        tf = [tf_dict[movie][tag] for movie, tag in zip(movies, tags)]
+        idf = [idf_dict[tag] for tag in tags]
+        rank_weight = [(max_ranks[movie] - rank + 1) / max_ranks[movie] * 100 for movie, rank in zip(movies, ranks)]
+        timestamp_weight = [(position + 1) / num_rows * 10 for position in positions]
+        value = [ts + tf_weight * idf_weight * 100 + rank_weight for ts, tf_weight, idf_weight, rank_weight
+                 in zip(timestamp_weight, tf, idf, rank_weight)]
+
+        return {"tf": numpy.array(tf), "idf": numpy.array(idf), "rank": numpy.array(rank_weight),
+                "timestamp": numpy.array(timestamp_weight), "value": numpy.array(value)}
+
+    def vectorized_weights(self):
+        """
+        The same weights from the tag weighting kernels
+        :return: dictionary of weight arrays
+        """
+        movies = self.tag_log.movieid.values
+        tags = self.tag_log.tag.values
+
+        tf = self.tag_weighting.get_tf_weights(movies, tags)
+        idf = self.tag_weighting.get_row_weights(self.tag_weighting.get_idf_weights(movies, tags), tags)
+        rank_weight = self.tag_weighting.get_rank_weights(movies, self.tag_log.actor_movie_rank.values)
+        timestamp_weight = self.tag_weighting.get_timestamp_weights(self.tag_log.position.values, len(movies))
+        value = timestamp_weight + tf * idf * 100 + rank_weight
+
+        return {"tf": tf, "idf": idf, "rank": rank_weight, "timestamp": timestamp_weight, "value": value}
+
+    def time_weights(self, weigh):
+        start = time.perf_counter()
+        weights = weigh()
+
+        return weights, time.perf_counter() - start
+
+    def run(self):
+        """
+        Time both weighings and check that they give identical numbers
+        :return: (reference seconds, vectorized seconds)
+        """
+        (vectorized, vectorized_time) = self.time_weights(self.vectorized_weights)
+        log.info("Vectorized kernels: %.2f s", vectorized_time)
+        (reference, reference_time) = self.time_weights(self.reference_weights)
+        log.info("Row by row weighing: %.2f s", reference_time)
+
+        for name in ["tf", "idf", "rank", "timestamp", "value"]:
+            if not numpy.array_equal(reference[name], vectorized[name]):
+                raise ValueError("The %s weights differ" % name)
+        log.info("All the weights are identical, speedup %.1fx", reference_time / vectorized_time)
+
+        return reference_time, vectorized_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='benchmark_tag_weighting.py --rows 10000000',
+    )
+    parser.add_argument('--rows', action="store", type=int, default=10000000)
+    parser.add_argument('--movies', action="store", type=int, default=10000)
+    parser.add_argument('--tags', action="store", type=int, default=1128)
+    parser.add_argument('--max_rank', action="store", type=int, default=20)
+    parser.add_argument('--seed', action="store", type=int, default=0)
+    input = vars(parser.parse_args())
+    benchmark = TagWeightingBenchmark(input['rows'], input['movies'], input['tags'], input['max_rank'], input['seed'])
+    benchmark.run()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy
+import pandas as pd
+from config_parser import ParseConfig
+from data_extractor import DataExtractor
+from matrix_store import MatrixStore
+
+log = logging.getLogger(__name__)
+
+
+class DatasetContext(DataExtractor):
+    """
+    Process wide session over the data set, shared by all the task classes.
+    Every resource is read at most once per process (and again only if its file changes on the disk),
+    and frames derived from the resources are built once and memoized the same way.
+    Callers get shallow copies of the shared frames, whose cached columns are read-only memory maps,
+    so adding or dropping columns never leaks into the other task objects.
+    """
+
+    contexts = {}
+
+    @classmethod
+    def get_context(cls, data_set_loc=None):
+        """
+        Return the context of the data set, creating it on the first call
+        :param data_set_loc: location of the 'resources' directory, read from config.ini when not passed
+        :return: dataset context
+        """
+        if data_set_loc is None:
+            data_set_loc = ParseConfig().config_section_mapper("filePath").get("data_set_loc")
+        key = os.path.abspath(data_set_loc)
+        if key not in cls.contexts:
+            cls.contexts[key] = cls(data_set_loc)
+
+        return cls.contexts[key]
+
+    def __init__(self, file_path, use_cache=True):
+        super().__init__(file_path, use_cache)
+        self.frames = {}
+        self.derived = {}
+        self.matrix_store = MatrixStore(os.path.join(file_path, "cache", "matrices")) if use_cache else None
+        self.corpus_path = os.path.join(file_path, "cache", "corpora") if use_cache else None
+
+    def get_file_version(self, file_name):
+        stat = os.stat(os.path.join(self.file_path, file_name))
+
+        return stat.st_mtime, stat.st_size
+
+    def get_sources_key(self, name, file_names, params=None):
+        """
+        Key of a value derived from resource files, which changes when one of the files or the settings change
+        :param name: name of the derived value
+        :param file_names: resource files the value depends on
+        :param params: json serializable settings the value is built with
+        :return: hex digest
+        """
+        versions = [[file_name] + list(self.get_file_version(file_name)) for file_name in file_names]
+
+        return hashlib.sha1(json.dumps([name, versions, params], sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get_view(self, value):
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return value.copy(deep=False)
+
+        return value
+
+    def data_extractor(self, file_name):
+        if file_name in self.WRITTEN_FILES:
+            return super().data_extractor(file_name)
+        version = self.get_file_version(file_name)
+        cached = self.frames.get(file_name)
+        if cached is None or cached[0] != version:
+            cached = (version, super().data_extractor(file_name))
+            self.frames[file_name] = cached
+
+        return self.get_view(cached[1])
+
+    def get_derived(self, name, builder, file_names):
+        """
+        Memoize a value derived from resource files
+        :param name: name of the derived value
+        :param builder: function computing the value
+        :param file_names: resource files the value depends on, it is rebuilt when one of them changes
+        :return: the derived value, frames are returned as shallow copies
+        """
+        version = tuple(self.get_file_version(file_name) for file_name in file_names)
+        cached = self.derived.get(name)
+        if cached is None or cached[0] != version:
+            cached = (version, builder())
+            self.derived[name] = cached
+
+        return self.get_view(cached[1])
+
+    def refresh_stored_matrix(self, name, builder, file_names, params=None):
+        """
+        Build and save a matrix derived from resource files, unless the stored one is still fresh
+        :param name: entry name in the matrix store
+        :param builder: function computing (matrix, row ids, column ids)
+        :param file_names: resource files the matrix depends on
+        :param params: json serializable settings the matrix is built with
+        :return: the built value when it could not be stored, None otherwise
+        """
+        sources = [os.path.join(self.file_path, file_name) for file_name in file_names]
+        if self.matrix_store is None:
+            return builder()
+        if self.matrix_store.is_fresh(name, sources, params):
+            return None
+
+        built = builder()
+        try:
+            self.matrix_store.save_matrix(name, built[0], built[1], built[2], sources, params)
+        except OSError as error:
+            log.warning("Unable to store %s: %s" % (name, error))
+            self.matrix_store.clear(name)
+            return built
+
+        return None
+
+    def clear_stored_matrix(self, name):
+        """
+        Drop a matrix from the matrix store, so that it is built again the next time it is asked for
+        :param name: entry name in the matrix store
+        """
+        if self.matrix_store is not None:
+            self.matrix_store.clear(name)
+
+    def get_stored_matrix(self, name, builder, file_names, params=None):
+        """
+        Matrix derived from resource files, kept in the matrix store and rebuilt only when one of them changes
+        :param name: entry name in the matrix store
+        :param builder: function computing (matrix, row ids, column ids)
+        :param file_names: resource files the matrix depends on
+        :param params: json serializable settings the matrix is built with
+        :return: (matrix, row ids, column ids), with memory mapped arrays when it is stored
+        """
+        built = self.refresh_stored_matrix(name, builder, file_names, params)
+        if built is not None:
+            return built
+
+        return self.matrix_store.load_matrix(name)
+
+    def get_stored_row(self, name, row_id, builder, file_names, params=None):
+        """
+        One row of a stored matrix, read without loading the rest of the matrix
+        :param name: entry name in the matrix store
+        :param row_id:
+        :param builder: function computing (matrix, row ids, column ids)
+        :param file_names: resource files the matrix depends on
+        :param params: json serializable settings the matrix is built with
+        :return: dense array of the row, None if the id has no row
+        """
+        built = self.refresh_stored_matrix(name, builder, file_names, params)
+        if built is None:
+            return self.matrix_store.get_row(name, row_id)
+
+        positions = [position for position, each in enumerate(built[1]) if each == row_id]
+        if not positions:
+            return None
+        row = built[0][positions[0]]
+
+        return row.toarray().ravel() if hasattr(row, "toarray") else numpy.array(row)
+
+    def get_movie_rating_stats(self):
+        """
+        Rating statistics (count, sum, histogram and mean) of every movie, shared by all the task objects
+        :return: data frame indexed by movieid
+        """
+        return self.get_derived("movie_rating_stats", self.get_movie_rating_aggregates, ["mlratings.csv"])
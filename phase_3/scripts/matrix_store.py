@@ -0,0 +1,129 @@
+import os
+
+import numpy
+import scipy.sparse
+from column_store import ColumnStore
+
+
+class MatrixStore(ColumnStore):
+    """
+    Class to persist dense and sparse matrices on the disk as memory mappable .npy files,
+    together with the ids of their rows and columns.
+    Dense matrices are saved as one array, sparse matrices as the data, indices and indptr arrays of their csr form,
+    so that a single row can be read without loading the rest of the matrix.
+    Entries record the fingerprint of their source files the same way as the column store entries.
+    """
+
+    def save_ids(self, file_loc, ids):
+        ids = numpy.asarray(ids)
+        if ids.dtype == object:
+            ids = numpy.array([str(each) for each in ids], dtype=str)
+        numpy.save(file_loc, ids)
+
+    def load_ids(self, file_loc):
+        ids = numpy.load(file_loc, allow_pickle=False)
+        if ids.dtype.kind == "U":
+            ids = ids.astype(object)
+
+        return ids
+
+    def create_dense_matrix(self, name, shape, dtype=numpy.float64):
+        """
+        Create the memory mapped array of a dense entry, to be filled in place and then passed to save_matrix.
+        The entry cannot be loaded until save_matrix writes its meta data.
+        :param name: entry name
+        :param shape:
+        :param dtype:
+        :return: writable memory mapped array
+        """
+        self.clear(name)
+        entry_path = self.get_entry_path(name)
+        os.makedirs(entry_path)
+
+        return numpy.lib.format.open_memmap(os.path.join(entry_path, "matrix.npy"), mode="w+", dtype=dtype,
+                                            shape=tuple(shape))
+
+    def save_matrix(self, name, matrix, row_ids, column_ids, sources, params=None):
+        """
+        Write a matrix with the ids of its rows and columns
+        :param name: entry name
+        :param matrix: dense array or sparse matrix, or the array returned by create_dense_matrix
+        :param row_ids: id of every row
+        :param column_ids: id of every column, None if the columns have no ids
+        :param sources: list of files the matrix was derived from
+        :param params: json serializable settings the matrix was built with
+        """
+        entry_path = self.get_entry_path(name)
+        matrix_loc = os.path.join(entry_path, "matrix.npy")
+        in_place = isinstance(matrix, numpy.memmap) and matrix.filename is not None and \
+            os.path.abspath(matrix.filename) == os.path.abspath(matrix_loc)
+        if not in_place:
+            self.clear(name)
+            os.makedirs(entry_path)
+
+        if scipy.sparse.issparse(matrix):
+            kind = "sparse"
+            matrix = scipy.sparse.csr_matrix(matrix)
+            matrix.sum_duplicates()
+            numpy.save(os.path.join(entry_path, "data.npy"), matrix.data)
+            numpy.save(os.path.join(entry_path, "indices.npy"), matrix.indices)
+            numpy.save(os.path.join(entry_path, "indptr.npy"), matrix.indptr)
+        else:
+            kind = "dense"
+            if in_place:
+                matrix.flush()
+            else:
+                numpy.save(matrix_loc, numpy.ascontiguousarray(matrix))
+        self.save_ids(os.path.join(entry_path, "row_ids.npy"), row_ids)
+        if column_ids is not None:
+            self.save_ids(os.path.join(entry_path, "column_ids.npy"), column_ids)
+
+        self.write_meta(name, {"kind": kind, "shape": list(matrix.shape), "column_ids": column_ids is not None,
+                               "params": params, "sources": [self.get_file_fingerprint(source) for source in sources]})
+
+    def load_matrix(self, name):
+        """
+        Memory map a matrix entry
+        :param name: entry name
+        :return: (dense array or csr matrix, row ids, column ids or None)
+        """
+        entry_path = self.get_entry_path(name)
+        meta = self.read_meta(name)
+        if meta["kind"] == "sparse":
+            matrix = scipy.sparse.csr_matrix((self.load_array(os.path.join(entry_path, "data.npy")),
+                                              self.load_array(os.path.join(entry_path, "indices.npy")),
+                                              self.load_array(os.path.join(entry_path, "indptr.npy"))),
+                                             shape=tuple(meta["shape"]), copy=False)
+        else:
+            matrix = self.load_array(os.path.join(entry_path, "matrix.npy"))
+        row_ids = self.load_ids(os.path.join(entry_path, "row_ids.npy"))
+        column_ids = None
+        if meta["column_ids"]:
+            column_ids = self.load_ids(os.path.join(entry_path, "column_ids.npy"))
+
+        return matrix, row_ids, column_ids
+
+    def get_row(self, name, row_id):
+        """
+        Read the row of one id, touching only the bytes of that row
+        :param name: entry name
+        :param row_id:
+        :return: dense array of the row, None if the id has no row
+        """
+        entry_path = self.get_entry_path(name)
+        meta = self.read_meta(name)
+        positions = numpy.flatnonzero(self.load_ids(os.path.join(entry_path, "row_ids.npy")) == row_id)
+        if len(positions) == 0:
+            return None
+        position = positions[0]
+
+        if meta["kind"] == "dense":
+            return numpy.array(self.load_array(os.path.join(entry_path, "matrix.npy"))[position])
+
+        indptr = self.load_array(os.path.join(entry_path, "indptr.npy"))
+        (start, end) = (indptr[position], indptr[position + 1])
+        data = self.load_array(os.path.join(entry_path, "data.npy"))
+        row = numpy.zeros(meta["shape"][1], dtype=data.dtype)
+        row[self.load_array(os.path.join(entry_path, "indices.npy"))[start:end]] = data[start:end]
+
+        return row
@@ -1,10 +1,11 @@
 import logging
-import math
-from collections import Counter
 
+import numpy
 import pandas as pd
+import scipy.sparse
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
+from tag_weighting import TagWeighting
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -18,28 +19,28 @@ class ActorTag(object):
     Class to relate actors and tags.
     """
 
+    ACTOR_TAG_DATA_FILES = ["movie-actor.csv", "mltags.csv", "genome-tags.csv", "imdb-actor-info.csv"]
+
     def __init__(self):
         """
         Initializing the data extractor object to get data from the csv files
         """
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
+        self.tag_weighting = TagWeighting()
 
     def assign_idf_weight(self, data_series, unique_tags):
         """
         This function computes the idf weight for all tags in a data frame,
         considering each movie as a document
-        :param data_frame:
+        :param data_series: series of the set of tags of every movie
         :param unique_tags:
         :return: dictionary of tags and idf weights
         """
-        idf_counter = {tag: 0 for tag in unique_tags}
-        for tag_list in data_series:
-            for tag in tag_list:
-                idf_counter[tag] += 1
-        for tag, count in list(idf_counter.items()):
-            idf_counter[tag] = math.log(len(data_series.index)/count, 2)
-        return idf_counter
+        movie_tags = data_series.explode()
+        idf_weights = self.tag_weighting.get_idf_weights(movie_tags.index, movie_tags.values,
+                                                         num_documents=len(data_series.index))
+        return {tag: idf_weights[tag] for tag in unique_tags}
 
     def assign_tf_weight(self, tag_series):
         """
@@ -47,75 +48,57 @@ class ActorTag(object):
         :param tag_series:
         :return: dictionary of tags and tf weights
         """
-        counter = Counter()
-        for each in tag_series:
-            counter[each] += 1
-        total = sum(counter.values())
-        for each in counter:
-            counter[each] = (counter[each]/total)
-        return dict(counter)
+        tags = list(tag_series)
+        tf_weights = self.tag_weighting.get_tf_weights(numpy.zeros(len(tags), dtype=numpy.int64), tags)
+        return dict(zip(tags, tf_weights))
 
     def assign_rank_weight(self, data_frame):
         """
         This function assigns a value for all the actors in a movie on a scale of 100,
          based on their rank in the movie.
-        :param tag_series:
+        :param data_frame: data frame with the movieid and actor_movie_rank columns
         :return: dictionary of (movieid, actor_rank) to the computed rank_weight
         """
-        groupby_movies = data_frame.groupby("movieid")
-        movie_rank_weight_dict = {}
-        for movieid, info_df in groupby_movies:
-           max_rank = info_df.actor_movie_rank.max()
-           for rank in info_df.actor_movie_rank.unique():
-             movie_rank_weight_dict[(movieid, rank)] = (max_rank - rank + 1)/max_rank*100
-        return movie_rank_weight_dict
+        rank_df = data_frame[["movieid", "actor_movie_rank"]].drop_duplicates()
+        rank_weights = self.tag_weighting.get_rank_weights(rank_df.movieid.values, rank_df.actor_movie_rank.values)
+        return dict(zip(zip(rank_df.movieid, rank_df.actor_movie_rank), rank_weights))
 
-    def get_model_weight(self, tf_weight_dict, idf_weight_dict, rank_weight_dict, tag_df, model):
+    def get_model_weight(self, tf_weights, idf_weights, rank_weights, tag_df, model):
         """
         This function combines tf_weight on a scale of 100, idf_weight on a scale of 100,
         actor_rank for each tag on scale of 100 and timestamp_weight on a scale of 10 , based on the model.
-        :param tf_weight_dict, idf_weight_dict, rank_weight_dict, tag_df, model
+        :param tf_weights, idf_weights, rank_weights: arrays of weights aligned with the rows of tag_df
+        :param tag_df, model
         :return: data_frame with column of the combined weight
         """
         if model == "TF":
-            tag_df["value"] = pd.Series(
-                [(tf_weight_dict.get(movieid, 0).get(tag, 0)*100) + rank_weight_dict.get((movieid, rank), 0) for
-                 index, ts_weight, tag, movieid, rank
-                 in zip(tag_df.index, tag_df.timestamp_weight, tag_df.tag, tag_df.movieid, tag_df.actor_movie_rank)],
-                index=tag_df.index)
+            tag_df["value"] = tf_weights * 100 + rank_weights
         else:
-            tag_df["value"] = pd.Series(
-                [(ts_weight + (tf_weight_dict.get(movieid, 0).get(tag, 0)*(idf_weight_dict.get(tag, 0))*100) + rank_weight_dict.get((movieid, rank), 0))  for
-                 index, ts_weight, tag, movieid, rank
-                 in zip(tag_df.index, tag_df.timestamp_weight, tag_df.tag, tag_df.movieid, tag_df.actor_movie_rank)],
-                index=tag_df.index)
+            tag_df["value"] = tag_df.timestamp_weight.values + tf_weights * idf_weights * 100 + rank_weights
         return tag_df
 
-    def combine_computed_weights(self, data_frame, rank_weight_dict, idf_weight_dict, model):
+    def combine_computed_weights(self, data_frame, idf_weights, model):
         """
         Triggers the weighing process and sums up all the calculated weights for each tag
-        :param data_frame:
-        :param rank_weight_dict:
+        :param data_frame: tag rows of the actor, with the timestamp_weight and rank_weight columns
+        :param idf_weights: series of idf weights indexed by tag, empty for the TF model
         :param model:
         :return: dictionary of tags and weights
         """
         tag_df = data_frame.reset_index()
-        temp_df = tag_df.groupby(['movieid'])['tag'].apply(lambda x: ','.join(x)).reset_index()
-        movie_tag_dict = dict(zip(temp_df.movieid, temp_df.tag))
-        tf_weight_dict = {movie: self.assign_tf_weight(tags.split(',')) for movie, tags in list(movie_tag_dict.items())}
-        tag_df = self.get_model_weight(tf_weight_dict, idf_weight_dict, rank_weight_dict, tag_df, model)
-        tag_df["total"] = tag_df.groupby(['tag'])['value'].transform('sum')
+        tf_weights = self.tag_weighting.get_tf_weights(tag_df.movieid.values, tag_df.tag)
+        idf_weights = self.tag_weighting.get_row_weights(idf_weights, tag_df.tag)
+        tag_df = self.get_model_weight(tf_weights, idf_weights, tag_df.rank_weight.values, tag_df, model)
+        tag_df["total"] = tag_df.groupby(['tag'], observed=True)['value'].transform('sum')
         tag_df = tag_df.drop_duplicates("tag").sort_values("total", ascending=False)
         actor_tag_dict = dict(zip(tag_df.tag, tag_df.total))
         return actor_tag_dict
 
-    def merge_movie_actor_and_tag(self, actorid, model):
+    def build_actor_tag_data(self):
         """
-        Merges data from different csv files necessary to compute the tag weights for each actor,
-        assigns weights to timestamp.
-        :param actorid:
-        :param model:
-        :return: returns a dictionary of Actors to dictionary of tags and weights.
+        Merges data from different csv files necessary to compute the tag weights of the actors,
+        assigns weights to timestamp and to the actor rank.
+        :return: data frame with a row for every (actor, movie, tag) in the timestamp order
         """
         mov_act = self.data_extractor.get_movie_actor_data()
         ml_tag = self.data_extractor.get_mltags_data()
@@ -126,19 +109,79 @@ class ActorTag(object):
         merged_data_frame = actor_movie_info.merge(tag_data_frame, how="left", on="movieid")
         merged_data_frame = merged_data_frame[merged_data_frame['timestamp'].notnull()]
         merged_data_frame = merged_data_frame.drop(["userid"], axis=1)
-        rank_weight_dict = self.assign_rank_weight(merged_data_frame[['movieid', 'actor_movie_rank']])
         merged_data_frame = merged_data_frame.sort_values("timestamp", ascending=True).reset_index()
         data_frame_len = len(merged_data_frame.index)
-        merged_data_frame["timestamp_weight"] = pd.Series([(index + 1) / data_frame_len * 10 for index in merged_data_frame.index],
-                                                   index=merged_data_frame.index)
+        merged_data_frame["timestamp_weight"] = self.tag_weighting.get_timestamp_weights(merged_data_frame.index.values,
+                                                                                         data_frame_len)
+        merged_data_frame["rank_weight"] = self.tag_weighting.get_rank_weights(merged_data_frame.movieid.values,
+                                                                               merged_data_frame.actor_movie_rank.values)
+        return merged_data_frame
+
+    def get_actor_tag_data(self):
+        """
+        Merged actor tag data, built once per process
+        :return: data frame
+        """
+        return self.data_extractor.get_derived("actor_tag_data", self.build_actor_tag_data, self.ACTOR_TAG_DATA_FILES)
+
+    def build_actor_tag_matrix(self, model):
+        """
+        Computes the tag vectors of all the actors in one pass over the merged data.
+        Every (actor, movie) pair is a document for the tf weight and every movie is a document for the idf weight,
+        so each row holds the same weights as weighing the rows of that actor on their own.
+        :param model: TF or TFIDF
+        :return: (sparse actor x tag matrix, sorted actor ids of the rows, tags of the columns)
+        """
+        merged_data_frame = self.get_actor_tag_data()
+        merged_data_frame = merged_data_frame[merged_data_frame.tag.notnull()]
+        actor_codes, actor_ids = pd.factorize(merged_data_frame.actorid.values, sort=True)
+        movie_codes, movie_ids = pd.factorize(merged_data_frame.movieid.values)
+        document_keys = actor_codes.astype(numpy.int64) * len(movie_ids) + movie_codes
+        (document_codes, num_documents, tag_codes, tags, pair_codes) = self.tag_weighting.get_pair_codes(
+            document_keys, merged_data_frame.tag.values)
+
+        tf_weights = self.tag_weighting.get_tf_weights(document_codes, tag_codes)
         if model == 'TFIDF':
-            idf_weight_dict = self.assign_idf_weight(merged_data_frame.groupby('movieid')['tag'].apply(set), merged_data_frame.tag.unique())
-            tag_dict = self.combine_computed_weights(merged_data_frame[merged_data_frame['actorid'] == actorid], rank_weight_dict, idf_weight_dict, model)
+            idf_weights = self.tag_weighting.get_row_weights(
+                self.tag_weighting.get_idf_weights(movie_codes, tag_codes), tag_codes)
         else:
-            tag_dict = self.combine_computed_weights(merged_data_frame[merged_data_frame['actorid'] == actorid], rank_weight_dict, {},model)
+            idf_weights = numpy.zeros(len(tag_codes))
+        tag_df = self.get_model_weight(tf_weights, idf_weights, merged_data_frame.rank_weight.values,
+                                       merged_data_frame[["timestamp_weight"]].copy(), model)
+
+        actor_tag_codes = actor_codes.astype(numpy.int64) * len(tags) + tag_codes
+        totals = tag_df["value"].groupby(actor_tag_codes).sum()
+        actor_tag_codes = totals.index.values
+        actor_tag_matrix = scipy.sparse.csr_matrix(
+            (totals.values, (actor_tag_codes // len(tags), actor_tag_codes % len(tags))),
+            shape=(len(actor_ids), len(tags)))
+
+        return actor_tag_matrix, numpy.asarray(actor_ids), tags
 
-        return tag_dict
+    def get_actor_tag_matrix(self, model):
+        """
+        Sparse actor x tag matrix of the model, built once per process
+        :param model: TF or TFIDF
+        :return: (sparse actor x tag matrix, sorted actor ids of the rows, tags of the columns)
+        """
+        return self.data_extractor.get_derived("actor_tag_matrix_%s" % model,
+                                               lambda: self.build_actor_tag_matrix(model), self.ACTOR_TAG_DATA_FILES)
 
+    def merge_movie_actor_and_tag(self, actorid, model):
+        """
+        Looks up the tag weights of an actor in the actor tag matrix of the model.
+        :param actorid:
+        :param model:
+        :return: returns a dictionary of tags and weights, highest weight first.
+        """
+        (actor_tag_matrix, actor_ids, tags) = self.get_actor_tag_matrix(model)
+        position = numpy.searchsorted(actor_ids, actorid)
+        if position == len(actor_ids) or actor_ids[position] != actorid:
+            return {}
+        row = actor_tag_matrix.getrow(position)
+        order = numpy.argsort(-row.data, kind="mergesort")
+
+        return dict(zip(tags[row.indices[order]], row.data[order]))
 
 if __name__ == "__main__":
     obj = ActorTag()
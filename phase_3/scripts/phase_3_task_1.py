@@ -3,22 +3,29 @@ import operator
 from collections import Counter
 
 import numpy
+import pandas as pd
+import scipy.sparse
+from phase1_task_2 import GenreTag
+from sparse_tensor import SparseTensor
 from util import Util
 
 
 class UserMovieRecommendation(object):
-    def __init__(self, user_id):
+    def __init__(self, user_id, epsilon=None, refit=False):
         self.util = Util()
+        self.epsilon = epsilon
+        self.refit = refit
+        self.refitted_models = set()
         self.genre_data = self.util.genre_data
         self.user_id = user_id
         self.watched_movies = self.util.get_all_movies_for_user(self.user_id)
         self.model_movies_dict = {}
 
-    def get_movie_movie_matrix(self, model):
+    def fit_movie_latent_matrix(self, model):
         """
-        Finds movie_tag matrix and returns movie_movie_similarity matrix
+        Finds movie_tag matrix and fits the latent representation of every movie under the given model
         :param model:
-        :return: movie_movie_similarity matrix
+        :return: (list of movies, movie x latent matrix), the sparse movie tag matrix itself for PageRank
         """
         movie_latent_matrix = None
         movies = None
@@ -27,19 +34,19 @@ class UserMovieRecommendation(object):
             tag_df = movie_tag_data_frame.groupby(['movieid'])['tag_string'].apply(list).reset_index()
             movies = tag_df.movieid.tolist()
             movies_tags_list = list(tag_df.tag_string)
-            (U, Vh) = self.util.LDA(movies_tags_list, num_topics=10, num_features=len(self.genre_data.tag_string.unique()))
+            (U, Vh) = self.util.LDA(movies_tags_list, num_topics=10, num_features=len(self.genre_data.tag_string.unique()),
+                                    name="movie_tag_documents", file_names=GenreTag.GENRE_DATA_FILES)
             movie_latent_matrix = self.util.get_doc_topic_matrix(U, num_docs=len(movies), num_topics=10)
         elif model == "SVD" or model == "PCA":
-            movie_tag_frame = self.util.get_movie_tag_matrix()
-            movie_tag_matrix = movie_tag_frame.values
-            movies = list(movie_tag_frame.index.values)
+            (movie_tag_matrix, movie_ids, tags) = self.util.get_movie_tag_sparse_matrix()
+            movies = list(movie_ids)
             if model == "SVD":
-                (U, s, Vh) = self.util.SVD(movie_tag_matrix)
+                (U, s, Vh) = self.util.SVD(movie_tag_matrix, k=10)
                 movie_latent_matrix = U[:, :10]
             else:
-                (U, s, Vh) = self.util.PCA(movie_tag_matrix)
+                (U, s, Vh) = self.util.PCA(movie_tag_matrix, k=10)
                 tag_latent_matrix = U[:, :10]
-                movie_latent_matrix = numpy.dot(movie_tag_matrix, tag_latent_matrix)
+                movie_latent_matrix = movie_tag_matrix @ tag_latent_matrix
         elif model == "TD":
             tensor = self.fetch_movie_genre_tag_tensor()
             factors = self.util.CPDecomposition(tensor, 10)
@@ -47,24 +54,132 @@ class UserMovieRecommendation(object):
             movies.sort()
             movie_latent_matrix = factors[0]
         elif model == "PageRank":
-            movie_tag_frame = self.util.get_movie_tag_matrix()
-            movie_tag_matrix = movie_tag_frame.values
-            movies = list(movie_tag_frame.index.values)
+            (movie_tag_matrix, movie_ids, tags) = self.util.get_movie_tag_sparse_matrix()
+            movies = list(movie_ids)
             movie_latent_matrix = movie_tag_matrix
-        latent_movie_matrix = movie_latent_matrix.transpose()
-        movie_movie_matrix = numpy.dot(movie_latent_matrix, latent_movie_matrix)
 
-        return movies, movie_movie_matrix
+        return movies, movie_latent_matrix
+
+    def get_latent_model_entry(self, model):
+        """
+        Name and settings of the matrix store entry of a latent model. The tensor of TD only holds the tags of
+        the movies watched by the user, so its model is kept per user and refitted when they change.
+        :param model:
+        :return: (entry name, json serializable settings)
+        """
+        if model == "TD":
+            return "movie_latent_TD_%s" % self.user_id, \
+                   {"model": model, "rank": 10, "watched_movies": sorted(int(movie) for movie in self.watched_movies)}
+
+        return "movie_latent_%s" % model, {"model": model, "rank": 10}
+
+    def build_movie_latent_matrix(self, model):
+        """
+        Fits the latent model for the matrix store
+        :param model:
+        :return: (movie x latent matrix, movies of the rows, None)
+        """
+        (movies, movie_latent_matrix) = self.fit_movie_latent_matrix(model)
+
+        return movie_latent_matrix, numpy.asarray(movies), None
+
+    def get_movie_latent_matrix(self, model):
+        """
+        Latent representation of every movie under the given model, fitted once per version of the data set and
+        kept in the matrix store. The model is fitted again on the first call for it when refit is set.
+        :param model:
+        :return: (list of movies, movie x latent matrix), the sparse movie tag matrix itself for PageRank
+        """
+        if model == "PageRank":
+            return self.fit_movie_latent_matrix(model)
+
+        (name, params) = self.get_latent_model_entry(model)
+        if self.refit and model not in self.refitted_models:
+            self.util.data_extractor.clear_stored_matrix(name)
+            self.refitted_models.add(model)
+        (movie_latent_matrix, movies, column_ids) = self.util.data_extractor.get_stored_matrix(
+            name, lambda: self.build_movie_latent_matrix(model), GenreTag.GENRE_DATA_FILES, params)
+
+        return list(movies), movie_latent_matrix
+
+    def get_similar_movies(self, movies, movie_latent_matrix, seed_movies, num_of_movies):
+        """
+        Movies most similar to the seed movies, num_of_movies shared among the seeds in their order. Only the rows
+        of the seeds are multiplied with the latent matrix, in one product, instead of the whole movie movie
+        matrix. The seeds and the movies already picked are masked out of every row, ties go to the earlier movie.
+        :param movies: list of movies of the rows of the latent matrix
+        :param movie_latent_matrix: movie x latent matrix, dense or sparse
+        :param seed_movies:
+        :param num_of_movies:
+        :return: list of movies
+        """
+        movies = numpy.asarray(movies)
+        seed_positions = pd.Index(movies).get_indexer(list(seed_movies))
+        if (seed_positions < 0).any():
+            missing = [seed for seed, position in zip(seed_movies, seed_positions) if position < 0]
+            raise ValueError("Seed movies without a latent vector: %s" % missing)
+        similarities = movie_latent_matrix[seed_positions] @ movie_latent_matrix.transpose()
+        if scipy.sparse.issparse(similarities):
+            similarities = similarities.toarray()
+        similarities = numpy.asarray(similarities, dtype=numpy.float64)
+
+        masked = numpy.zeros(len(movies), dtype=bool)
+        masked[seed_positions] = True
+        distribution_list = self.util.get_distribution_count(seed_movies, num_of_movies)
+        picked = []
+        for row, num_of_movies_to_pick in zip(similarities, distribution_list):
+            num_of_movies_to_pick = min(num_of_movies_to_pick, len(movies) - int(masked.sum()))
+            row = numpy.where(masked, -numpy.inf, row)
+            top = self.util.page_rank.get_top_k(row, num_of_movies_to_pick)
+            masked[top] = True
+            picked.extend(top.tolist())
+            if len(picked) == num_of_movies:
+                break
+
+        return movies[picked].tolist()
 
     def compute_pagerank(self):
         """
         Function to prepare data for pageRank and calling pageRank method
         :return: list of (movie,weight) tuple
         """
-        (movies, movie_movie_matrix) = self.get_movie_movie_matrix("PageRank")
+        (transition, dangling, movies) = self.util.get_movie_movie_graph()
         seed_movies = self.watched_movies
 
-        return self.util.compute_pagerank(seed_movies, movie_movie_matrix, movies)
+        return self.util.compute_graph_pagerank(seed_movies, transition, dangling, movies, self.epsilon)
+
+    def get_unwatched_movies(self, ranked_movies, watched_movies):
+        """
+        First 5 movies of a PageRank ranking that the user has not watched
+        :param ranked_movies: list of (movie, weight) tuples
+        :param watched_movies:
+        :return: list of movies
+        """
+        recommended_movies = []
+        for movie_p, weight_p in ranked_movies:
+            if len(recommended_movies) == 5:
+                break
+            if movie_p not in watched_movies:
+                recommended_movies.append(movie_p)
+
+        return recommended_movies
+
+    def get_pagerank_recommendations(self, user_ids):
+        """
+        PageRank recommendations of many users, running the Personalised PageRank of all of them together
+        over the movie_movie graph
+        :param user_ids:
+        :return: dictionary of user id to the list of recommended movies, users without any movie are left out
+        """
+        watched_movies = {user_id: self.util.get_all_movies_for_user(user_id) for user_id in user_ids}
+        watched_movies = {user_id: movies for user_id, movies in watched_movies.items() if len(movies) > 0}
+        (transition, dangling, movies) = self.util.get_movie_movie_graph()
+        user_ids = list(watched_movies.keys())
+        rankings = self.util.compute_graph_pagerank_batch([watched_movies[user_id] for user_id in user_ids],
+                                                          transition, dangling, movies)
+
+        return {user_id: self.get_unwatched_movies(ranking, watched_movies[user_id])
+                for user_id, ranking in zip(user_ids, rankings)}
 
     def get_recommendation(self, model):
         """
@@ -78,84 +193,26 @@ class UserMovieRecommendation(object):
             print("THIS USER HAS NOT WATCHED ANY MOVIE.\nAborting...")
             exit(1)
         if model == "PageRank":
-            recommended_dict = self.compute_pagerank()
-            for movie_p, weight_p in recommended_dict:
-                if len(recommended_movies) == 5:
-                    break
-                if movie_p not in self.watched_movies:
-                    recommended_movies.append(movie_p)
+            recommended_movies = self.get_unwatched_movies(self.compute_pagerank(), self.watched_movies)
         elif model == "Combination":
             return self.get_combined_recommendation()
         elif model == "SVD" or model == "PCA" or model == "LDA" or model == "TD":
-            (movies, movie_movie_matrix) = self.get_movie_movie_matrix(model)
-            movie_row_dict = {}
-            for i in range(0, len(movies)):
-                if movies[i] in self.watched_movies:
-                    movie_row_dict[movies[i]] = movie_movie_matrix[i]
-            distribution_list = self.util.get_distribution_count(self.watched_movies, 5)
-            index = 0
-            for movie in self.watched_movies:
-                movie_row = movie_row_dict[movie]
-                labelled_movie_row = dict(zip(movies, movie_row))
-                num_of_movies_to_pick = distribution_list[index]
-                for each in self.watched_movies:
-                    del labelled_movie_row[each]
-                for each in recommended_movies:
-                    del labelled_movie_row[each]
-                labelled_movie_row_sorted = sorted(labelled_movie_row.items(), key=operator.itemgetter(1), reverse=True)
-                labelled_movie_row_sorted = labelled_movie_row_sorted[0:num_of_movies_to_pick]
-                for (m, v) in labelled_movie_row_sorted:
-                    recommended_movies.append(m)
-                if len(recommended_movies) == 5:
-                    break
-                index += 1
+            (movies, movie_latent_matrix) = self.get_movie_latent_matrix(model)
+            recommended_movies = self.get_similar_movies(movies, movie_latent_matrix, self.watched_movies, 5)
 
         return recommended_movies
 
     def fetch_movie_genre_tag_tensor(self):
         """
-        Create Movie Genre Tag tensor
-        :return: tensor
-        """
-        movie_list = self.genre_data["movieid"].unique()
-        movie_list.sort()
-        movie_count = 0
-        movie_dict = {}
-        for element in movie_list:
-            movie_dict[element] = movie_count
-            movie_count += 1
-
-        genre_list = self.genre_data["genre"].unique()
-        genre_list.sort()
-        genre_count = 0
-        genre_dict = {}
-        for element in genre_list:
-            genre_dict[element] = genre_count
-            genre_count += 1
-
+        Create Movie Genre Tag tensor, over the tags of the movies watched by the user
+        :return: sparse tensor
+        """
         user_df = self.genre_data[self.genre_data['movieid'].isin(self.watched_movies)]
         tag_list = user_df["tag_string"].unique()
         tag_list.sort()
-        tag_count = 0
-        tag_dict = {}
-        for element in tag_list:
-            tag_dict[element] = tag_count
-            tag_count += 1
-
-        tensor = numpy.zeros((movie_count, genre_count, tag_count))
-
-        for index, row in self.genre_data.iterrows():
-            movie = row["movieid"]
-            genre = row["genre"]
-            tag = row["tag_string"]
-            if genre not in genre_list or tag not in tag_list:
-                continue
-            movie_id = movie_dict[movie]
-            genre_name = genre_dict[genre]
-            tag_name = tag_dict[tag]
-            tensor[movie_id][genre_name][tag_name] = 1
 
-        return tensor
+        return SparseTensor.from_data_frame(self.genre_data, ["movieid", "genre", "tag_string"],
+                                            labels={"tag_string": tag_list})
 
     def get_combined_recommendation(self):
         """
@@ -184,28 +241,44 @@ class UserMovieRecommendation(object):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
-        description='phase_3_task_1.py user_id model',
+        description='phase_3_task_1.py user_ids model',
     )
-    parser.add_argument('user_id', action="store", type=int)
+    parser.add_argument('user_ids', action="store", type=str,
+                        help="user id, or comma separated user ids whose PageRank is computed together")
     parser.add_argument('model', action="store", choices=['SVD', 'PCA', 'LDA', 'TD', 'PageRank', 'Combination'])
+    parser.add_argument('--epsilon', action="store", type=float, default=None,
+                        help="approximate PageRank by forward push with this residual threshold per edge, such as 1e-6")
+    parser.add_argument('--refit', action="store_true",
+                        help="fit the latent models again instead of loading them from the cache")
     ip = vars(parser.parse_args())
-    user_id = ip['user_id']
-    model = ip['model']
-    obj = UserMovieRecommendation(user_id=user_id)
-    if model not in obj.model_movies_dict.keys():
-        recommended_movies = obj.get_recommendation(model)
-        obj.model_movies_dict[model] = recommended_movies
-    else:
-        recommended_movies = obj.model_movies_dict[model]
-    obj.util.print_movie_recommendations_and_collect_feedback(recommended_movies, 1, user_id)
-    while True:
-        confirmation = input("\n\nAre you done checking recommendation for all models? (y/Y/n/N): ")
-        if confirmation == "y" or confirmation == "Y":
-            break
-        model = input("\n\nPlease enter the next model you want to use for recommendation: ")
+    user_ids = [int(each) for each in ip['user_ids'].split(",")]
+    pagerank_movies = {}
+    if ip['model'] == "PageRank" and ip['epsilon'] is None and len(user_ids) > 1:
+        pagerank_movies = UserMovieRecommendation(user_id=user_ids[0]).get_pagerank_recommendations(user_ids)
+    for user_id in user_ids:
+        model = ip['model']
+        obj = UserMovieRecommendation(user_id=user_id, epsilon=ip['epsilon'], refit=ip['refit'])
+        if len(user_ids) > 1:
+            if len(obj.watched_movies) == 0:
+                print("\nUSER %d HAS NOT WATCHED ANY MOVIE. Skipping..." % user_id)
+                continue
+            print("\nRecommendations for user %d" % user_id)
+        if user_id in pagerank_movies:
+            obj.model_movies_dict["PageRank"] = pagerank_movies[user_id]
         if model not in obj.model_movies_dict.keys():
             recommended_movies = obj.get_recommendation(model)
             obj.model_movies_dict[model] = recommended_movies
         else:
             recommended_movies = obj.model_movies_dict[model]
         obj.util.print_movie_recommendations_and_collect_feedback(recommended_movies, 1, user_id)
+        while True:
+            confirmation = input("\n\nAre you done checking recommendation for all models? (y/Y/n/N): ")
+            if confirmation == "y" or confirmation == "Y":
+                break
+            model = input("\n\nPlease enter the next model you want to use for recommendation: ")
+            if model not in obj.model_movies_dict.keys():
+                recommended_movies = obj.get_recommendation(model)
+                obj.model_movies_dict[model] = recommended_movies
+            else:
+                recommended_movies = obj.model_movies_dict[model]
+            obj.util.print_movie_recommendations_and_collect_feedback(recommended_movies, 1, user_id)
@@ -1,9 +1,8 @@
 import argparse
-import math
-import operator
 
 import config_parser
-import data_extractor
+import dataset_context
+import numpy
 from util import Util
 
 
@@ -12,13 +11,12 @@ class ProbabilisticRelevanceFeedbackUserMovieRecommendation(object):
         self.user_id = user_id
         self.conf = config_parser.ParseConfig()
         self.data_set_loc = self.conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = data_extractor.DataExtractor(self.data_set_loc)
+        self.data_extractor = dataset_context.DatasetContext.get_context(self.data_set_loc)
         self.feedback_data = self.get_feedback_data()
         self.util = Util()
         self.movies_dict = {}
-        self.tag_dict = {}
         self.movie_tag_matrix = self.get_movie_tag_matrix()
-        self.feedback_metadata_dict = {}
+        self.feedback_metadata = None
 
     def get_feedback_data(self):
         """
@@ -46,51 +44,24 @@ class ProbabilisticRelevanceFeedbackUserMovieRecommendation(object):
         Compute the movie tag matrix
         :return: movie tag matix of 0s and 1s
         """
-        movie_tag_matrix = self.util.get_movie_tag_matrix()
-        movie_tag_matrix[movie_tag_matrix > 0] = 1
+        (movie_tag_matrix, movies_list, tags_list) = self.util.get_movie_tag_sparse_matrix()
+        movie_tag_matrix = (movie_tag_matrix > 0).astype(float).tocsr()
 
         movie_index = 0
-        movies_list = list(movie_tag_matrix.index.values)
         for movie in movies_list:
             self.movies_dict[movie] = movie_index
             movie_index += 1
 
-        tag_index = 0
-        tags_list = list(movie_tag_matrix.columns.values)
-        for tag in tags_list:
-            self.tag_dict[tag] = tag_index
-            tag_index += 1
+        return movie_tag_matrix
 
-        return movie_tag_matrix.values
+    def get_movie_rows(self, movies):
+        return [self.movies_dict[movie] for movie in movies]
 
-    def get_movie_similarity(self, movie_id):
+    def get_feedback_metadata(self):
         """
-        Calculate the similarity for the movie id passed as input
-        :param movie_id:
-        :return: similarity value
-        """
-        movie_index = self.movies_dict[movie_id]
-        movie_tag_values = self.movie_tag_matrix[movie_index]
-
-        similarity = 0
-        for tag in self.tag_dict.keys():
-            if tag in self.feedback_metadata_dict.keys():
-                (p_i, u_i) = self.feedback_metadata_dict[tag]
-            else:
-                (p_i, u_i) = self.get_feedback_metadata(self.tag_dict[tag])
-                self.feedback_metadata_dict[tag] = (p_i, u_i)
-            numerator = p_i * (1 - u_i)
-            denominator = u_i * (1 - p_i)
-            temp = movie_tag_values[self.tag_dict[tag]] * (math.log(numerator / denominator))
-            similarity += temp
-
-        return similarity
-
-    def get_feedback_metadata(self, tag_index):
-        """
-        get p_i and u_i values for the tag index passed as input
-        :param tag_index:
-        :return: (p_i, u_i)
+        get the p_i and u_i values of all the tags, counting the relevant and the judged movies holding every tag
+        as column sums of their rows of the movie tag matrix
+        :return: (p_i array, u_i array) in the order of the tags
         """
         user_feedback_data = self.feedback_data[self.feedback_data['user-id'] == self.user_id]
         user_relevant_data = user_feedback_data[user_feedback_data['relevancy'] == 'relevant']
@@ -101,47 +72,36 @@ class ProbabilisticRelevanceFeedbackUserMovieRecommendation(object):
         R = len(user_relevant_movies)
         N = R + len(user_irrelevant_movies)
 
-        count = 0
-        for movie in user_relevant_movies:
-            movie_index = self.movies_dict[movie]
-            if self.movie_tag_matrix[movie_index][tag_index] == 1:
-                count += 1
-        r_i = count
+        r_i = numpy.asarray(self.movie_tag_matrix[self.get_movie_rows(user_relevant_movies)].sum(axis=0)).ravel()
+        n_i = numpy.asarray(
+            self.movie_tag_matrix[self.get_movie_rows(user_feedback_data['movie-id'].unique())].sum(axis=0)).ravel()
 
-        count = 0
-        for movie in user_feedback_data['movie-id'].unique():
-            movie_index = self.movies_dict[movie]
-            if self.movie_tag_matrix[movie_index][tag_index] == 1:
-                count += 1
-        n_i = count
+        p_i = (r_i + 0.5) / float(R + 1)
+        u_i = (n_i - r_i + 0.5) / float(N - R + 1)
 
-        numerator = r_i + 0.5
-        denominator = R + 1
-        p_i = numerator / float(denominator)
+        return p_i, u_i
 
-        numerator = n_i - r_i + 0.5
-        denominator = N - R + 1
-        u_i = numerator / float(denominator)
+    def get_movie_similarities(self):
+        """
+        Calculate the similarity of every movie, the sum of the log odds of the tags it holds
+        :return: array of similarity values in the order of the movie tag matrix rows
+        """
+        if self.feedback_metadata is None:
+            self.feedback_metadata = self.get_feedback_metadata()
+        (p_i, u_i) = self.feedback_metadata
+        log_odds = numpy.log((p_i * (1 - u_i)) / (u_i * (1 - p_i)))
 
-        return p_i, u_i
+        return self.movie_tag_matrix @ log_odds
 
     def get_movie_recommendations(self):
         """
         Get top 5 movies movie recommendations based on probabilistic relevance feedback
         :return: 5 movie recommendations
         """
-        movie_similarity = {}
-
-        for movie in self.movies_dict.keys():
-            movie_similarity[movie] = self.get_movie_similarity(movie)
-
-        movie_recommendations = []
-        for movie, value in sorted(movie_similarity.items(), key=operator.itemgetter(1), reverse=True):
-            if len(movie_recommendations) == 5:
-                break
-            movie_recommendations.append(movie)
+        movies = numpy.array(list(self.movies_dict.keys()))
+        order = numpy.argsort(-self.get_movie_similarities(), kind="stable")
 
-        return movie_recommendations
+        return movies[order[:5]].tolist()
 
     def print_movie_recommendations_and_collect_feedback(self):
         """
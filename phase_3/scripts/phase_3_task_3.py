@@ -13,7 +13,7 @@ conf = ParseConfig()
 class MovieLSH():
     def __init__(self, num_layers, num_hashs):
         self.util = Util()
-        self.movie_tag_df = self.util.get_movie_tag_matrix()
+        (self.movie_tag_matrix, self.movie_ids, self.tags) = self.util.get_movie_tag_sparse_matrix()
         self.num_layers = num_layers
         self.num_hashs = num_hashs
         self.latent_range_dict = {}
@@ -25,7 +25,7 @@ class MovieLSH():
         self.movie_bucket_df = pd.DataFrame()
         self.movie_latent_df = pd.DataFrame()
         self.w_length = 0.0
-        (self.U, self.s, self.Vt) = self.util.SVD(self.movie_tag_df.values)
+        (self.U, self.s, self.Vt) = self.util.SVD(self.movie_tag_matrix, k=500)
         self.data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
 
     def assign_group(self, value):
@@ -97,8 +97,7 @@ class MovieLSH():
         for movie in range(0, len(self.U_matrix)):
             bucket_matrix[movie] = self.LSH(self.U_matrix[movie])
 
-        movie_df = self.movie_tag_df.reset_index()
-        movie_id_df = pd.DataFrame(movie_df["movieid"])
+        movie_id_df = pd.DataFrame({"movieid": self.movie_ids})
         self.movie_latent_df = U_dataframe.join(movie_id_df, how="left")
         self.movie_latent_df.to_csv(os.path.join(self.data_set_loc, "movie_latent_semantic.csv"), index=False)
         return pd.DataFrame(bucket_matrix).join(movie_id_df, how="left")
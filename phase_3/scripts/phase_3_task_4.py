@@ -1,7 +1,7 @@
 import os
 
 import config_parser
-import data_extractor
+import dataset_context
 import pandas as pd
 from phase_3_task_3 import MovieLSH
 from util import Util
@@ -11,7 +11,7 @@ class NearestNeighborBasedRelevanceFeedback(object):
     def __init__(self):
         self.conf = config_parser.ParseConfig()
         self.data_set_loc = self.conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = data_extractor.DataExtractor(self.data_set_loc)
+        self.data_extractor = dataset_context.DatasetContext.get_context(self.data_set_loc)
         self.util = Util()
         self.movies_dict = {}
         self.movie_tag_matrix = self.get_movie_tag_matrix()
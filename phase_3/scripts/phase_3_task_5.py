@@ -6,7 +6,7 @@ import cvxopt
 cvxopt.solvers.options['show_progress'] = False
 
 import config_parser
-import data_extractor
+import dataset_context
 import numpy
 from scipy.spatial import distance as dist
 from util import *
@@ -14,15 +14,13 @@ from util import *
 util = Util()
 conf = config_parser.ParseConfig()
 data_set_loc = conf.config_section_mapper("filePath").get("data_set_loc")
-data_extractor_obj = data_extractor.DataExtractor(data_set_loc)
-movie_tag_frame = util.get_movie_tag_matrix()
-
-movie_tag_matrix_value = movie_tag_frame.values
-(U, s, Vh) = util.SVD(movie_tag_matrix_value)
+data_extractor_obj = dataset_context.DatasetContext.get_context(data_set_loc)
+(movie_tag_matrix_value, movie_ids, tag_names) = util.get_movie_tag_sparse_matrix()
+(U, s, Vh) = util.SVD(movie_tag_matrix_value, k=10)
 movie_latent_matrix = U[:, :10]
 
-movies = list(movie_tag_frame.index.values)
-tags = list(movie_tag_frame)
+movies = list(movie_ids)
+tags = list(tag_names)
 label_movies_json_data = data_extractor_obj.get_json()
 
 
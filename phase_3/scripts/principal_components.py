@@ -0,0 +1,65 @@
+import numpy
+import scipy.sparse
+import scipy.sparse.linalg
+from truncated_svd import TruncatedSVD
+
+
+class PrincipalComponents(object):
+    """
+    PCA without the features x features covariance matrix. The principal components are the right singular
+    vectors of the centered data, and the variances their squared singular values over n - 1. The data is
+    centered implicitly, through a linear operator subtracting the column means from every product, so a
+    sparse matrix stays sparse and only k vectors of the size of the feature space are held.
+    """
+
+    def __init__(self, truncated_svd=None):
+        """
+        :param truncated_svd: rank k SVD engine, a default one when not passed
+        """
+        self.truncated_svd = truncated_svd if truncated_svd is not None else TruncatedSVD()
+        self.components = None
+        self.singular_values = None
+        self.mean = None
+        self.num_seen = 0
+
+    def get_column_means(self, matrix):
+        return numpy.asarray(matrix.mean(axis=0), dtype=numpy.float64).ravel()
+
+    def get_centered_operator(self, matrix, means):
+        """
+        Linear operator of the matrix minus its column means, without subtracting them from the matrix
+        :param matrix: dense array or scipy sparse matrix
+        :param means: column means
+        :return: linear operator
+        """
+        ones = numpy.ones(matrix.shape[0])
+
+        def matmat(vectors):
+            return matrix @ vectors - numpy.outer(ones, means @ vectors)
+
+        def rmatmat(vectors):
+            return matrix.T @ vectors - numpy.outer(means, ones @ vectors)
+
+        return scipy.sparse.linalg.LinearOperator(
+            matrix.shape, matvec=lambda vector: matmat(vector.reshape(-1, 1)).ravel(),
+            rmatvec=lambda vector: rmatmat(vector.reshape(-1, 1)).ravel(), matmat=matmat, rmatmat=rmatmat,
+            dtype=numpy.float64)
+
+    def get_variances(self):
+        return self.singular_values ** 2 / max(self.num_seen - 1, 1)
+
+    def fit(self, matrix, k):
+        """
+        First k principal components of the rows of a matrix
+        :param matrix: dense array or scipy sparse matrix
+        :param k: number of components
+        :return: (k x features components, variances along them)
+        """
+        if not scipy.sparse.issparse(matrix):
+            matrix = numpy.asarray(matrix, dtype=numpy.float64)
+        self.mean = self.get_column_means(matrix)
+        self.num_seen = matrix.shape[0]
+        (U, self.singular_values, self.components) = self.truncated_svd.decompose(
+            self.get_centered_operator(matrix, self.mean), k)
+
+        return self.components, self.get_variances()
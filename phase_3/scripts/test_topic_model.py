@@ -0,0 +1,51 @@
+import logging
+import unittest
+
+import numpy
+from topic_model import TopicModel
+
+logging.getLogger("gensim").setLevel(logging.WARNING)
+
+
+class TopicModelTest(unittest.TestCase):
+    """
+    Batched inference of the topic model against gensim's own E step on a small fitted model
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        random = numpy.random.RandomState(0)
+        tags = ["tag_%d" % each for each in range(60)]
+        # three groups of tags, every document drawing its tags mostly from one of them
+        cls.documents = [[tags[(group * 20 + random.randint(20)) if random.rand() < 0.8 else random.randint(60)]
+                          for each in range(random.randint(3, 12))]
+                         for group in random.randint(3, size=200)]
+        cls.topic_model = TopicModel(passes=5)
+        cls.corpus = cls.topic_model.fit(cls.documents, 3)
+
+    def test_infer_gamma_matches_gensim_inference(self):
+        lda = self.topic_model.lda
+        chunk = self.corpus[:50] + [[]]
+        lda.random_state = numpy.random.RandomState(1)
+        expected = lda.inference(chunk)[0]
+        lda.random_state = numpy.random.RandomState(1)
+        gamma = self.topic_model.infer_gamma(chunk)
+
+        numpy.testing.assert_allclose(gamma, expected, rtol=1e-4)
+
+    def test_doc_topic_matrix_matches_gensim_inference(self):
+        lda = self.topic_model.lda
+        lda.random_state = numpy.random.RandomState(2)
+        gamma = numpy.vstack([lda.inference(self.corpus[start:start + 64])[0]
+                              for start in range(0, len(self.corpus), 64)])
+        expected = gamma / gamma.sum(axis=1, keepdims=True)
+        expected[expected < lda.minimum_probability] = 0
+        lda.random_state = numpy.random.RandomState(2)
+        topic_matrix = self.topic_model.get_doc_topic_matrix(self.corpus, chunksize=64)
+
+        self.assertEqual(topic_matrix.shape, (len(self.corpus), 3))
+        numpy.testing.assert_allclose(topic_matrix, expected, atol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,22 @@
 import logging
 import math
-import operator
 import os
 
-import gensim
 import numpy
 import pandas as pd
+import scipy.sparse
 import tensorly.tensorly.decomposition as decomp
 from config_parser import ParseConfig
-from data_extractor import DataExtractor
+from dataset_context import DatasetContext
+from page_rank import PageRank
 from phase1_task_2 import GenreTag
+from principal_components import PrincipalComponents
+from sparse_tensor import SparseTensor
+from topic_model import TopicModel
+from truncated_svd import TruncatedSVD
 
 logging.getLogger("gensim").setLevel(logging.CRITICAL)
+log = logging.getLogger(__name__)
 
 
 class Util(object):
@@ -21,10 +26,47 @@ class Util(object):
     def __init__(self):
         self.conf = ParseConfig()
         self.data_set_loc = self.conf.config_section_mapper("filePath").get("data_set_loc")
-        self.data_extractor = DataExtractor(self.data_set_loc)
+        self.data_extractor = DatasetContext.get_context(self.data_set_loc)
         self.mlmovies = self.data_extractor.get_mlmovies_data()
         self.genre_tag = GenreTag()
+        self.page_rank = PageRank()
+        self.truncated_svd = TruncatedSVD()
+        self.topic_model = None
         self.genre_data = self.genre_tag.get_genre_data()
+        self.movie_id_index = self.data_extractor.get_derived(
+            "movie_id_index", lambda: self.build_lookup_index(self.mlmovies, 'moviename', 'movieid'), ["mlmovies.csv"])
+        self.movie_name_index = self.data_extractor.get_derived(
+            "movie_name_index", lambda: self.build_lookup_index(self.mlmovies, 'movieid', 'moviename'), ["mlmovies.csv"])
+        self.movie_rows_index = self.data_extractor.get_derived(
+            "movie_rows_index", lambda: self.build_rows_index(self.genre_data, 'movieid'), GenreTag.GENRE_DATA_FILES)
+        self.tag_rows_index = self.data_extractor.get_derived(
+            "tag_rows_index", lambda: self.build_rows_index(self.genre_data, 'tag_string'), GenreTag.GENRE_DATA_FILES)
+        self.user_rows_index = self.data_extractor.get_derived(
+            "user_rows_index", lambda: self.build_rows_index(self.genre_data, 'userid'), GenreTag.GENRE_DATA_FILES)
+
+    def build_lookup_index(self, data_frame, key_column, value_column):
+        """
+        Build a dictionary from every key to the value of the first row holding that key
+        :param data_frame:
+        :param key_column:
+        :param value_column:
+        :return: dictionary of key to value
+        """
+        unique_rows = data_frame.drop_duplicates(key_column)
+
+        return dict(zip(unique_rows[key_column], unique_rows[value_column]))
+
+    def build_rows_index(self, data_frame, key_column):
+        """
+        Build a dictionary from every key to the positions of the rows holding that key, in row order
+        :param data_frame:
+        :param key_column:
+        :return: dictionary of key to array of row positions
+        """
+        return data_frame.groupby(key_column, sort=False).indices
+
+    def get_rows(self, rows_index, key):
+        return rows_index.get(key, numpy.empty(0, dtype=numpy.intp))
 
     def get_movie_id(self, movie):
         """
@@ -32,141 +74,247 @@ class Util(object):
         :param movie:
         :return: movie id
         """
-        all_movie_data = self.mlmovies
-        movie_data = all_movie_data[all_movie_data['moviename'] == movie]
-        movie_id = movie_data['movieid'].unique()
+        return self.movie_id_index[movie]
 
-        return movie_id[0]
+    def get_movie_ids(self, movies):
+        """
+        Obtain the IDs for a list of movie names
+        :param movies:
+        :return: list of movie ids
+        """
+        return [self.movie_id_index[movie] for movie in movies]
 
     def CPDecomposition(self, tensor, rank):
         """
         Perform CP Decomposition
-        :param tensor:
+        :param tensor: dense array, or sparse tensor whose dense view is decomposed
         :param rank:
         :return: factor matrices obtained after decomposition
         """
+        if isinstance(tensor, SparseTensor):
+            tensor = tensor.to_dense()
         (movie_count, genre_count, tag_count) = tensor.shape
         rank = min(rank, movie_count-1, genre_count-1, tag_count-1)
         factors = decomp.parafac(tensor, rank)
 
         return factors
 
-    def SVD(self, matrix):
+    def SVD(self, matrix, k=None):
         """
         Perform SVD
-        :param matrix:
-        :return: factor matrices and the core matrix
+        :param matrix: dense array or scipy sparse matrix
+        :param k: number of singular values to compute, all of them when not passed
+        :return: factor matrices and the core matrix, singular values in descending order
         """
-        U, s, Vh = numpy.linalg.svd(matrix, full_matrices=False)
+        if k is None:
+            if scipy.sparse.issparse(matrix):
+                matrix = matrix.toarray()
+            U, s, Vh = numpy.linalg.svd(matrix, full_matrices=False)
 
-        return U, s, Vh
+            return U, s, Vh
+
+        return self.truncated_svd.decompose(matrix, k)
+
+    def get_covariance(self, matrix):
+        """
+        Covariance of the columns of the matrix. A sparse matrix is not centered in place,
+        the covariance is computed from its gram matrix and column means.
+        :param matrix: dense array or scipy sparse matrix
+        :return: covariance matrix
+        """
+        if not scipy.sparse.issparse(matrix):
+            return numpy.cov(matrix, rowvar=False)
+
+        num_rows = matrix.shape[0]
+        means = numpy.asarray(matrix.mean(axis=0)).ravel()
+        gram = (matrix.T @ matrix).toarray()
 
-    def PCA(self, matrix):
+        return (gram - num_rows * numpy.outer(means, means)) / (num_rows - 1)
+
+    def PCA(self, matrix, k=None):
         """
         Perform PCA
-        :param matrix:
+        :param matrix: dense array or scipy sparse matrix
+        :param k: number of principal components to keep, all of them when not passed. The first k components
+        are computed from the implicitly centered matrix, without forming the covariance matrix.
         :return: factor matrices and the core matrix
         """
-        cov_df = numpy.cov(matrix, rowvar=False)
+        if k is not None:
+            (components, variances) = PrincipalComponents(self.truncated_svd).fit(matrix, k)
+            return components.T, variances, components
+
+        cov_df = self.get_covariance(matrix)
         U, s, Vh = numpy.linalg.svd(cov_df)
 
         return U, s, Vh
 
-    def LDA(self, input_compound_list, num_topics, num_features):
+    def LDA(self, input_compound_list, num_topics, num_features, name=None, file_names=None, params=None,
+            backend=None, workers=None):
         """
         Perform LDA
         :param input_compound_list:
         :param num_topics:
         :param num_features:
+        :param name: name of the documents, their corpus is serialized once per version of the resource files
+        when it is passed together with file_names
+        :param file_names: resource files the documents are built from
+        :param params: json serializable settings the documents are built with
+        :param backend: "single" for LdaModel, "multicore" for LdaMulticore, backend of the lda section of
+        config.ini when not passed
+        :param workers: number of worker processes of the multicore backend, workers of the lda section of
+        config.ini when not passed
         :return: topics and object topic distribution
         """
-        dictionary = gensim.corpora.Dictionary(input_compound_list)
-        corpus = [dictionary.doc2bow(text) for text in input_compound_list]
-        lda = gensim.models.ldamodel.LdaModel(corpus, num_topics, id2word=dictionary, passes=20)
-        latent_semantics = lda.print_topics(num_topics, num_features)
-        corpus = lda[corpus]
+        settings = self.conf.config_section_mapper("lda") if self.conf.config.has_section("lda") else {}
+        if backend is None:
+            backend = settings.get("backend") or "single"
+        if workers is None and settings.get("workers"):
+            workers = int(settings.get("workers"))
+        key = None
+        if name is not None and file_names is not None:
+            key = self.data_extractor.get_sources_key(name, file_names, params)
+        self.topic_model = TopicModel(backend, workers, corpus_path=self.data_extractor.corpus_path)
+        corpus = self.topic_model.fit(input_compound_list, num_topics, name, key)
+        latent_semantics = self.topic_model.lda.print_topics(num_topics, num_features)
+        corpus = self.topic_model.lda[corpus]
 
         return corpus, latent_semantics
 
-    def get_doc_topic_matrix(self, u, num_docs, num_topics):
+    def update_LDA(self, input_compound_list, num_features):
+        """
+        Fold new documents into the model of the last LDA call with an online update, instead of retraining it
+        :param input_compound_list: documents of the new objects
+        :param num_features:
+        :return: new object topic distribution and updated topics
+        """
+        corpus = self.topic_model.update(input_compound_list)
+        latent_semantics = self.topic_model.lda.print_topics(self.topic_model.lda.num_topics, num_features)
+
+        return self.topic_model.lda[corpus], latent_semantics
+
+    def get_doc_topic_matrix(self, u, num_docs, num_topics, dtype=numpy.float64):
         """
         Reconstructing data
-        :param u:
+        :param u: topic distributions returned by LDA or update_LDA
         :param num_docs:
         :param num_topics:
+        :param dtype: numpy.float32 halves the matrix and the dense products computed from it
         :return: reconstructed data
         """
-        u_matrix = numpy.zeros(shape=(num_docs, num_topics))
-
-        for i in range(0, len(u)):
-            doc = u[i]
-            for j in range(0, len(doc)):
-                (topic_no, prob) = doc[j]
-                u_matrix[i, topic_no] = prob
+        topic_model = self.topic_model
+        if topic_model is not None and getattr(u, "obj", None) is topic_model.lda and len(u.corpus) == num_docs:
+            return topic_model.get_doc_topic_matrix(u.corpus, dtype)
 
-        return u_matrix
+        return TopicModel().convert_doc_topic_corpus(u, num_docs, num_topics, dtype)
 
-    def get_transition_dataframe(self, data_frame):
+    def get_transition_matrix(self, node_matrix):
         """
         Function to get the transition matrix for Random walk
-        :param data_frame:
-        :return: transition matrix
-        """
-        for column in data_frame:
-            data_frame[column] = pd.Series(
-                [0 if ind == int(column) else each for ind, each in zip(data_frame.index, data_frame[column])],
-                index=data_frame.index)
-        data_frame["row_sum"] = data_frame.sum(axis=1)
-        for column in data_frame:
-            data_frame[column] = pd.Series(
-                [each / sum if (column != "row_sum" and each > 0 and ind != int(column) and sum!=0) else each for ind, each, sum in
-                 zip(data_frame.index, data_frame[column], data_frame.row_sum)],
-                index=data_frame.index)
-        data_frame = data_frame.drop(["row_sum"], axis=1)
-        data_frame.loc[(data_frame.T == 0).all()] = float(1 / (len(data_frame.columns)))
-        data_frame = data_frame.transpose()
-
-        return data_frame
-
-    def get_seed_matrix(self, transition_df, seed_nodes, nodes):
+        :param node_matrix: node x node similarity matrix, dense or sparse
+        :return: (sparse column stochastic transition matrix, boolean array of the dangling nodes)
+        """
+        return self.page_rank.build_transition_matrix(node_matrix)
+
+    def get_seed_matrix(self, num_nodes, seed_nodes, nodes):
         """
         Function to get the Restart matrix for entries in the seed list
-        :param transition_df:
+        :param num_nodes:
         :param seed_nodes:
-        :param nodeids:
+        :param nodes:
         :return: seed_matrix
         """
-        seed_matrix = [0.0 for each in range(len(transition_df.columns))]
+        seed_matrix = numpy.zeros(num_nodes)
         seed_value_list = self.distribute(seed_nodes, num_of_seeds_to_recommend=1)
-        for each in seed_nodes:
-            seed_matrix[list(nodes).index(each)] = seed_value_list[list(seed_nodes).index(each)]
+        node_positions = pd.Index(nodes).get_indexer(list(seed_nodes))
+        if (node_positions < 0).any():
+            missing = [seed for seed, position in zip(seed_nodes, node_positions) if position < 0]
+            raise ValueError("Seed nodes not in the graph: %s" % missing)
+        for position, seed_value in zip(node_positions, seed_value_list):
+            seed_matrix[position] = seed_value
 
         return seed_matrix
 
-    def compute_pagerank(self, seed_nodes, node_matrix, nodes):
+    def build_movie_movie_graph(self):
+        """
+        Movie movie similarity graph of the PageRank recommendations, the product of the movie tag matrix with its
+        transpose
+        :return: (sparse movie x movie matrix, sorted movie ids)
+        """
+        (movie_tag_matrix, movie_ids, tags) = self.get_movie_tag_sparse_matrix()
+
+        return movie_tag_matrix @ movie_tag_matrix.transpose(), movie_ids
+
+    def get_movie_movie_graph(self):
+        """
+        Transition matrix of the movie movie graph from the matrix store, built again only when one of the
+        resource files of the genre data changes
+        :return: (sparse column stochastic transition matrix, boolean array of the dangling nodes, sorted movie ids)
+        """
+        return self.page_rank.get_stored_graph(self.data_extractor, "movie_movie_graph", self.build_movie_movie_graph,
+                                               GenreTag.GENRE_DATA_FILES)
+
+    def compute_pagerank(self, seed_nodes, node_matrix, nodes, epsilon=None):
         """
         Function to compute the Personalised Pagerank for the given input
-        :param seed_actors:
-        :param actor_matrix:
-        :param actorids:
-        :return:
-        """
-        data_frame = pd.DataFrame(node_matrix)
-        transition_df = self.get_transition_dataframe(data_frame)
-        seed_matrix = self.get_seed_matrix(transition_df, seed_nodes, nodes)
-        result_list = seed_matrix
-        temp_list = []
-        num_of_iter = 0
-        while temp_list != result_list and num_of_iter <= 1000:
-            num_of_iter += 1
-            temp_list = result_list
-            result_list = list(
-                0.85 * numpy.matmul(numpy.array(transition_df.values), numpy.array(result_list)) + 0.15 * numpy.array(
-                    seed_matrix))
-        page_rank_dict = {i: j for i, j in zip(nodes, result_list)}
-        sorted_rank = sorted(page_rank_dict.items(), key=operator.itemgetter(1), reverse=True)
-
-        return sorted_rank[0:len(seed_nodes)+5]
+        :param seed_nodes:
+        :param node_matrix:
+        :param nodes:
+        :param epsilon: when passed, the scores are approximated by forward push from the seeds with this
+        residual threshold instead of being iterated over the whole graph
+        :return: list of (node, pagerank) of the len(seed_nodes) + 5 highest ranked nodes
+        """
+        (transition, dangling) = self.get_transition_matrix(node_matrix)
+
+        return self.compute_graph_pagerank(seed_nodes, transition, dangling, nodes, epsilon)
+
+    def compute_graph_pagerank(self, seed_nodes, transition, dangling, nodes, epsilon=None):
+        """
+        Function to compute the Personalised Pagerank over a transition matrix that is already built
+        :param seed_nodes:
+        :param transition: sparse column stochastic transition matrix
+        :param dangling: boolean array of the dangling nodes
+        :param nodes:
+        :param epsilon: when passed, the scores are approximated by forward push from the seeds with this
+        residual threshold instead of being iterated over the whole graph
+        :return: list of (node, pagerank) of the len(seed_nodes) + 5 highest ranked nodes
+        """
+        seed_matrix = self.get_seed_matrix(transition.shape[0], seed_nodes, nodes)
+        if epsilon is None:
+            (scores, num_of_iter, residual) = self.page_rank.power_iteration(transition, dangling, seed_matrix)
+            log.debug("PageRank stopped after %d iterations with residual %g" % (num_of_iter, residual))
+        else:
+            (scores, touched) = self.page_rank.get_approximate_scores(transition, dangling, seed_matrix, epsilon)
+            log.debug("Forward push touched %d of %d nodes" % (touched, transition.shape[0]))
+        nodes = numpy.asarray(nodes)
+        top = self.page_rank.get_top_k(scores, len(seed_nodes) + 5)
+
+        return list(zip(nodes[top].tolist(), scores[top].tolist()))
+
+    def compute_graph_pagerank_batch(self, seed_node_lists, transition, dangling, nodes, batch_size=32):
+        """
+        Function to compute the Personalised Pagerank of many seed lists over a transition matrix that is
+        already built, iterating on batch_size seed vectors at a time
+        :param seed_node_lists: list of seed lists
+        :param transition: sparse column stochastic transition matrix
+        :param dangling: boolean array of the dangling nodes
+        :param nodes:
+        :param batch_size: number of seed vectors iterated together
+        :return: list with the (node, pagerank) of the len(seed_nodes) + 5 highest ranked nodes of every seed list
+        """
+        nodes = numpy.asarray(nodes)
+        results = []
+        for start in range(0, len(seed_node_lists), batch_size):
+            batch = seed_node_lists[start:start + batch_size]
+            seed_matrix = numpy.column_stack([self.get_seed_matrix(transition.shape[0], seed_nodes, nodes)
+                                              for seed_nodes in batch])
+            (scores, num_of_iter, residuals) = self.page_rank.batch_power_iteration(transition, dangling, seed_matrix)
+            log.debug("PageRank batch stopped after %d iterations with residual %g" % (num_of_iter.max(),
+                                                                                       residuals.max()))
+            for column, seed_nodes in enumerate(batch):
+                top = self.page_rank.get_top_k(scores[:, column], len(seed_nodes) + 5)
+                results.append(list(zip(nodes[top].tolist(), scores[top, column].tolist())))
+
+        return results
 
     def print_movie_recommendations_and_collect_feedback(self, movie_ids, task_no, user_id):
         """
@@ -189,8 +337,7 @@ class Util(object):
             
         count = 1
         movie_dict = {}
-        for movie_id in movie_ids:
-            movie_name = self.get_movie_name_for_id(movie_id)
+        for movie_id, movie_name in zip(movie_ids, self.get_movie_names_for_ids(movie_ids)):
             print(str(count) + ". " + str(movie_name) + " - " + str(movie_id))
             movie_dict[count] = (movie_name, movie_id)
             count += 1
@@ -308,26 +455,48 @@ class Util(object):
 
         return seed_value_list
 
+    def build_movie_tag_sparse_matrix(self):
+        """
+        Vectorized computation of the movie tag matrix. Every row of the genre data is weighted with
+        timestamp_weight + tf * idf, where tf is the share of the rows of the movie having the tag and
+        idf is log2(number of movies / number of movies having the tag), and the weights are summed up
+        for every (movie, tag) pair.
+        :return: (csr matrix of movies x tags, sorted movie ids of the rows, sorted tags of the columns)
+        """
+        tag_df = self.genre_data
+        movie_codes, movie_ids = pd.factorize(tag_df["movieid"], sort=True)
+        tag_codes, tags = pd.factorize(tag_df["tag_string"], sort=True)
+        num_movies = len(movie_ids)
+        num_tags = len(tags)
+
+        pairs, pair_index = numpy.unique(movie_codes.astype(numpy.int64) * num_tags + tag_codes, return_inverse=True)
+
+        tag_weighting = self.genre_tag.tag_weighting
+        tf_weights = tag_weighting.get_tf_weights(movie_codes, tag_codes)
+        idf_weights = tag_weighting.get_row_weights(tag_weighting.get_idf_weights(movie_codes, tag_codes), tag_codes)
+        values = self.genre_tag.get_model_weight(tf_weights, idf_weights, tag_df[["timestamp_weight"]], 'tfidf')["value"]
+        totals = values.groupby(pair_index).sum().values
+        matrix = scipy.sparse.csr_matrix((totals, (pairs // num_tags, pairs % num_tags)), shape=(num_movies, num_tags))
+
+        return matrix, numpy.asarray(movie_ids), numpy.asarray(tags, dtype=object)
+
+    def get_movie_tag_sparse_matrix(self):
+        """
+        Sparse TF-IDF movie tag matrix, built once per process
+        :return: (csr matrix of movies x tags, sorted movie ids of the rows, sorted tags of the columns)
+        """
+        return self.data_extractor.get_derived("movie_tag_sparse_matrix", self.build_movie_tag_sparse_matrix,
+                                               GenreTag.GENRE_DATA_FILES)
+
     def get_movie_tag_matrix(self):
         """
         Function to get movie_tag matrix containing list of tags in each movie
-        :return: movie_tag_matrix
+        :return: movie_tag_matrix as a dense data frame indexed by movieid with one column per tag
         """
-        tag_df = self.genre_data
-        unique_tags = tag_df.tag_string.unique()
-        idf_data = tag_df.groupby(['movieid'])['tag_string'].apply(set)
-        tf_df = tag_df.groupby(['movieid'])['tag_string'].apply(list).reset_index()
-        movie_tag_dict = dict(zip(tf_df.movieid, tf_df.tag_string))
-        tf_weight_dict = {movie: self.genre_tag.assign_tf_weight(tags) for movie, tags in
-                          list(movie_tag_dict.items())}
-        idf_weight_dict = self.genre_tag.assign_idf_weight(idf_data, unique_tags)
-        tag_df = self.genre_tag.get_model_weight(tf_weight_dict, idf_weight_dict, tag_df, 'tfidf')
-        tag_df["total"] = tag_df.groupby(['movieid','tag_string'])['value'].transform('sum')
-        temp_df = tag_df[["movieid", "tag_string", "total"]].drop_duplicates().reset_index()
-        genre_tag_tfidf_df = temp_df.pivot_table('total', 'movieid', 'tag_string')
-        genre_tag_tfidf_df = genre_tag_tfidf_df.fillna(0)
-
-        return genre_tag_tfidf_df
+        (matrix, movie_ids, tags) = self.get_movie_tag_sparse_matrix()
+
+        return pd.DataFrame(matrix.toarray(), index=pd.Index(movie_ids, name="movieid"),
+                            columns=pd.Index(tags, name="tag_string"))
 
     def distribute(self, seed_nodes, num_of_seeds_to_recommend):
         """
@@ -352,11 +521,15 @@ class Util(object):
         :param movieid:
         :return: movie name
         """
-        all_movie_data = self.mlmovies
-        movie_data = all_movie_data[all_movie_data['movieid'] == movieid]
-        movie_name = movie_data['moviename'].unique()
+        return self.movie_name_index[movieid]
 
-        return movie_name[0]
+    def get_movie_names_for_ids(self, movieids):
+        """
+        movie names for a list of movie ids
+        :param movieids:
+        :return: list of movie names
+        """
+        return [self.movie_name_index[movieid] for movieid in movieids]
 
     def get_tag_list_for_movie(self, movie):
         """
@@ -364,29 +537,45 @@ class Util(object):
         :param movie: movie id
         :return: list of tags
         """
-        movie_specific_data = self.genre_data[self.genre_data["movieid"] == movie]
-        tags_list = movie_specific_data["tag_string"].unique()
+        rows = self.get_rows(self.movie_rows_index, movie)
+        tags_list = pd.unique(self.genre_data["tag_string"].values[rows])
 
         return tags_list
 
+    def get_tag_lists_for_movies(self, movies):
+        """
+        Get the tag lists for a list of movies
+        :param movies: movie ids
+        :return: list of tag lists
+        """
+        return [self.get_tag_list_for_movie(movie) for movie in movies]
+
     def get_movies_for_tag(self, tag):
         """
         Get the list of movies containing the tag
         :param tag: tag string
         :return: list of movies
         """
-        tag_specific_data = self.genre_data[self.genre_data["tag_string"] == tag]
-        movies_list = tag_specific_data["movieid"].unique()
+        rows = self.get_rows(self.tag_rows_index, tag)
+        movies_list = pd.unique(self.genre_data["movieid"].values[rows])
 
         return movies_list
 
+    def get_movies_for_tags(self, tags):
+        """
+        Get the lists of movies containing each of the tags
+        :param tags: tag strings
+        :return: list of movie lists
+        """
+        return [self.get_movies_for_tag(tag) for tag in tags]
+
     def get_all_movies_for_user(self, user_id):
         """
         Obtain all movies watched by the user
         :param user_id:
         :return: list of movies watched by the user
         """
-        user_data = self.genre_data[self.genre_data['userid'] == user_id]
+        user_data = self.genre_data.iloc[self.get_rows(self.user_rows_index, user_id)]
         user_data = user_data.sort_values('timestamp', ascending=False)
         movies = user_data['movieid'].unique()
 